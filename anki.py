@@ -1,40 +1,211 @@
 import base64
-import requests
+import threading
+import time
+from collections import defaultdict, deque
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
+import requests
+from requests.adapters import HTTPAdapter
+
+from retry import RetryPolicy
+
 ANKI_URL = "http://localhost:8765"
 BATCH_SIZE = 500
+# Bounds for the adaptive cardsInfo/notesInfo batch size, and what it aims each request
+# at: long enough to amortize AnkiConnect's per-request overhead, short enough that the
+# first batch arrives quickly and one response never holds too much in memory.
+MIN_BATCH_SIZE = 50
+MAX_BATCH_SIZE = 5000
+BATCH_SECONDS = 1.0
+BATCH_BYTES = 4 * 1024 * 1024
+FETCH_WINDOW = 2
+POOL_SIZE = 4
+# (connect, read) seconds. Reads are generous: cardsInfo on a full batch and
+# storeMediaFile on a large collection can legitimately take a while.
+TIMEOUT = (3.0, 120.0)
+FLUSH_SIZE = 1
+FLUSH_INTERVAL = 5.0
+
+# Called with None on success, or the error message for that one action.
+DoneCallback = Callable[[str | None], None]
+
+
+def _deck_query(deck_name: str, edited_days: int | None) -> str:
+    """Search for the deck, optionally only notes added or edited in the last N days."""
+    query = f'deck:"{deck_name}"'
+    if edited_days is not None:
+        query += f" edited:{edited_days}"
+    return query
+
+
+class _BatchSizer:
+    """Picks each cardsInfo/notesInfo batch size from the responses so far.
+
+    Keeps a smoothed per-record estimate of response time and body size, and sizes
+    the next batch to land near BATCH_SECONDS and under BATCH_BYTES, at most doubling
+    or halving per step and staying within [MIN_BATCH_SIZE, MAX_BATCH_SIZE]. With
+    adaptive off it always answers the starting size.
+    """
+
+    def __init__(self, size: int, adaptive: bool = True):
+        self.size = size
+        self.adaptive = adaptive
+        self._seconds: float | None = None
+        self._bytes: float | None = None
+
+    def observe(self, records: int, seconds: float, nbytes: int) -> None:
+        if not self.adaptive or records == 0:
+            return
+        per_second, per_byte = seconds / records, nbytes / records
+        if self._seconds is None:
+            self._seconds, self._bytes = per_second, per_byte
+        else:
+            self._seconds = (self._seconds + per_second) / 2
+            self._bytes = (self._bytes + per_byte) / 2
+        target = min(
+            BATCH_SECONDS / max(self._seconds, 1e-6),
+            BATCH_BYTES / max(self._bytes, 1.0),
+        )
+        target = max(self.size / 2, min(self.size * 2, target))
+        self.size = int(max(MIN_BATCH_SIZE, min(MAX_BATCH_SIZE, target)))
 
 
 class AnkiError(Exception):
     pass
 
 
+class AnkiConnectionError(AnkiError):
+    """AnkiConnect couldn't be reached or didn't answer; the request may succeed later."""
+
+
 class AnkiClient:
-    def __init__(self, url: str = ANKI_URL):
+    def __init__(
+        self,
+        url: str = ANKI_URL,
+        pool_size: int = POOL_SIZE,
+        timeout: float | tuple[float, float] = TIMEOUT,
+        retry: RetryPolicy | None = None,
+        fetch_window: int = FETCH_WINDOW,
+        batch_size: int | None = None,
+    ):
         self.url = url
+        self.timeout = timeout
+        self.retry = retry
+        # cardsInfo/notesInfo batches kept in flight at once; batch_size pins the size
+        # instead of adapting it from BATCH_SIZE.
+        self.fetch_window = max(1, fetch_window)
+        self.batch_size = batch_size
+        # One keep-alive session for the whole run, so write-heavy runs reuse a few
+        # connections instead of opening one per storeMediaFile/updateNoteFields.
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._latencies: dict[str, list[float]] = defaultdict(list)
+        self._latency_lock = threading.Lock()
+
+    def close(self) -> None:
+        self._session.close()
+
+    def latency_report(self) -> list[str]:
+        """One line per action: call count, mean and p95 round-trip time in ms."""
+        with self._latency_lock:
+            snapshot = {action: sorted(times) for action, times in self._latencies.items()}
+        lines = []
+        for action, times in sorted(snapshot.items()):
+            mean = sum(times) / len(times) * 1000
+            p95 = times[min(len(times) - 1, int(len(times) * 0.95))] * 1000
+            lines.append(f"{action}: {len(times)} calls, mean {mean:.1f} ms, p95 {p95:.1f} ms")
+        return lines
 
     def _request(self, action: str, params: dict | None = None) -> Any:
+        return self._request_sized(action, params)[0]
+
+    def _request_sized(self, action: str, params: dict | None = None) -> tuple[Any, int]:
+        """The action's result and the size of the response body in bytes."""
+        if self.retry is not None:
+            return self.retry.call(self._send, action, params)
+        return self._send(action, params)
+
+    def _send(self, action: str, params: dict | None = None) -> tuple[Any, int]:
         body = {"action": action, "version": 6, "params": params or {}}
+        start = time.perf_counter()
         try:
-            resp = requests.post(self.url, json=body)
+            resp = self._session.post(self.url, json=body, timeout=self.timeout)
             resp.raise_for_status()
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise AnkiConnectionError(f"Network error: {e}")
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code >= 500:
+                raise AnkiConnectionError(f"Network error: {e}")
+            raise AnkiError(f"Network error: {e}")
         except requests.RequestException as e:
             raise AnkiError(f"Network error: {e}")
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._latency_lock:
+                self._latencies[action].append(elapsed)
         data = resp.json()
         if data.get("error"):
             raise AnkiError(f"AnkiConnect: {data['error']}")
-        return data["result"]
+        return data["result"], len(resp.content)
+
+    def find_cards(self, deck_name: str, edited_days: int | None = None) -> list[int]:
+        return self._request("findCards", {"query": _deck_query(deck_name, edited_days)})
+
+    def find_notes(self, deck_name: str, edited_days: int | None = None) -> list[int]:
+        return self._request("findNotes", {"query": _deck_query(deck_name, edited_days)})
+
+    def cards_info(self, card_ids: list[int]) -> Iterator[list[dict]]:
+        """cardsInfo records, one list per batch, each fetched as the previous is consumed."""
+        return self._batched("cardsInfo", "cards", card_ids)
+
+    def notes_info(self, note_ids: list[int]) -> Iterator[list[dict]]:
+        """Fields, tags and card ids per note, without cardsInfo's template and review data.
 
-    def find_cards(self, deck_name: str) -> list[int]:
-        return self._request("findCards", {"query": f'deck:"{deck_name}"'})
+        Batched like cards_info().
+        """
+        return self._batched("notesInfo", "notes", note_ids)
 
-    def cards_info(self, card_ids: list[int]) -> list[dict]:
-        results = []
-        for i in range(0, len(card_ids), BATCH_SIZE):
-            batch = card_ids[i : i + BATCH_SIZE]
-            results.extend(self._request("cardsInfo", {"cards": batch}))
-        return results
+    def _batched(self, action: str, key: str, ids: list[int]) -> Iterator[list[dict]]:
+        """Fetch ids in batches, keeping up to fetch_window requests in flight.
+
+        Batches are yielded in id order. Each one's size is chosen when it is sent,
+        from the timings of the responses received so far.
+        """
+        sizer = _BatchSizer(self.batch_size or BATCH_SIZE, adaptive=self.batch_size is None)
+        if self.fetch_window == 1:
+            i = 0
+            while i < len(ids):
+                batch = ids[i : i + sizer.size]
+                i += len(batch)
+                result, seconds, nbytes = self._timed(action, {key: batch})
+                sizer.observe(len(batch), seconds, nbytes)
+                yield result
+            return
+
+        with ThreadPoolExecutor(max_workers=self.fetch_window) as pool:
+            pending = deque()
+            i = 0
+            while i < len(ids) or pending:
+                while i < len(ids) and len(pending) < self.fetch_window:
+                    batch = ids[i : i + sizer.size]
+                    i += len(batch)
+                    pending.append((len(batch), pool.submit(self._timed, action, {key: batch})))
+                records, future = pending.popleft()
+                result, seconds, nbytes = future.result()
+                sizer.observe(records, seconds, nbytes)
+                yield result
+
+    def _timed(self, action: str, params: dict) -> tuple[Any, float, int]:
+        start = time.perf_counter()
+        result, nbytes = self._request_sized(action, params)
+        return result, time.perf_counter() - start, nbytes
+
+    def media_file_names(self, pattern: str = "*") -> list[str]:
+        return self._request("getMediaFilesNames", {"pattern": pattern})
 
     def store_media_file(self, filename: str, data: bytes) -> None:
         self._request("storeMediaFile", {
@@ -43,6 +214,126 @@ class AnkiClient:
         })
 
     def update_note_field(self, note_id: int, field_name: str, value: str) -> None:
-        self._request("updateNoteFields", {
-            "note": {"id": note_id, "fields": {field_name: value}}
+        self.update_note_fields(note_id, {field_name: value})
+
+    def update_note_fields(self, note_id: int, fields: dict[str, str]) -> None:
+        self._request("updateNoteFields", {"note": {"id": note_id, "fields": fields}})
+
+    def multi(self, actions: list[tuple[str, dict]]) -> list[str | None]:
+        """Run several actions in one request; return each action's error, or None."""
+        results = self._request("multi", {
+            "actions": [
+                {"action": action, "version": 6, "params": params}
+                for action, params in actions
+            ]
         })
+        errors: list[str | None] = []
+        for item in results:
+            if isinstance(item, dict) and set(item) == {"result", "error"}:
+                errors.append(f"AnkiConnect: {item['error']}" if item["error"] else None)
+            else:
+                errors.append(None)
+        return errors
+
+    def writer(
+        self, flush_size: int = FLUSH_SIZE, flush_interval: float = FLUSH_INTERVAL
+    ) -> "BatchWriter":
+        return BatchWriter(self, flush_size, flush_interval)
+
+
+class BatchWriter:
+    """Buffers media uploads and note updates and sends them as `multi` requests.
+
+    A flush sends every queued storeMediaFile in one request, then every queued
+    updateNoteFields in a second one. A note update that names the media file it
+    points at (`requires`) is dropped, and reported as failed, if that upload failed,
+    so a note is never linked to audio Anki doesn't have. Each action's on_done
+    callback receives its own error, or None on success.
+    """
+
+    def __init__(self, client: AnkiClient, flush_size: int, flush_interval: float):
+        self.client = client
+        self.flush_size = max(1, flush_size)
+        self.flush_interval = flush_interval
+        self._media: list[tuple[str, str, DoneCallback | None]] = []
+        self._notes: list[tuple[int, dict[str, str], str | None, DoneCallback | None]] = []
+        self._first_queued: float | None = None
+
+    def __enter__(self) -> "BatchWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.flush()
+
+    def store_media_file(
+        self, filename: str, data: bytes, on_done: DoneCallback | None = None
+    ) -> None:
+        self._media.append((filename, base64.b64encode(data).decode("ascii"), on_done))
+        self._queued()
+
+    def update_note_fields(
+        self,
+        note_id: int,
+        fields: dict[str, str],
+        requires: str | None = None,
+        on_done: DoneCallback | None = None,
+    ) -> None:
+        self._notes.append((note_id, fields, requires, on_done))
+        self._queued()
+
+    def due_in(self) -> float | None:
+        """Seconds until the oldest queued write is due for a flush; None if none is queued."""
+        if self._first_queued is None:
+            return None
+        return max(0.0, self._first_queued + self.flush_interval - time.monotonic())
+
+    def flush_if_due(self) -> None:
+        if self._first_queued is None:
+            return
+        pending = len(self._media) + len(self._notes)
+        overdue = time.monotonic() - self._first_queued >= self.flush_interval
+        if pending >= self.flush_size or overdue:
+            self.flush()
+
+    def flush(self) -> None:
+        media, self._media = self._media, []
+        notes, self._notes = self._notes, []
+        self._first_queued = None
+
+        failed_media: set[str] = set()
+        if media:
+            errors = self._send([
+                ("storeMediaFile", {"filename": filename, "data": data})
+                for filename, data, _ in media
+            ])
+            for (filename, _, on_done), error in zip(media, errors):
+                if error:
+                    failed_media.add(filename)
+                if on_done:
+                    on_done(error)
+
+        ready = []
+        for note_id, fields, requires, on_done in notes:
+            if requires in failed_media:
+                if on_done:
+                    on_done(f"{requires} was not stored")
+            else:
+                ready.append((note_id, fields, on_done))
+        if ready:
+            errors = self._send([
+                ("updateNoteFields", {"note": {"id": note_id, "fields": fields}})
+                for note_id, fields, _ in ready
+            ])
+            for (_, _, on_done), error in zip(ready, errors):
+                if on_done:
+                    on_done(error)
+
+    def _queued(self) -> None:
+        if self._first_queued is None:
+            self._first_queued = time.monotonic()
+
+    def _send(self, actions: list[tuple[str, dict]]) -> list[str | None]:
+        try:
+            return self.client.multi(actions)
+        except AnkiError as e:
+            return [str(e)] * len(actions)
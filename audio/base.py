@@ -1,4 +1,8 @@
+import asyncio
 from abc import ABC, abstractmethod
+from concurrent.futures import Future
+
+from .encode import EncoderPool, EncodeSettings, to_mp3
 
 
 class AudioGenerator(ABC):
@@ -10,3 +14,67 @@ class AudioGenerator(ABC):
         natural-language steering (e.g. custom pronunciations) that guides
         delivery but is never spoken; empty string means no steering.
         """
+
+    async def agenerate(self, text: str, prompt: str = "") -> bytes:
+        """Coroutine version of generate().
+
+        The default runs generate() on asyncio's thread pool; providers with a native
+        async client override it so that many requests share one thread.
+        """
+        return await asyncio.to_thread(self.generate, text, prompt)
+
+    async def aclose(self) -> None:
+        """Release anything agenerate() bound to the running event loop."""
+
+
+class PcmAudioGenerator(AudioGenerator):
+    """An AudioGenerator that synthesizes raw PCM and encodes it to MP3 separately.
+
+    synthesize() is the network-bound half and encode() the CPU-bound half (speed
+    change and MP3 encoding). Keeping them apart lets a caller run many synthesize()
+    calls on threads while encode_async() hands the PCM to an EncoderPool, so the
+    network threads never wait on encoding. Without a pool, encoding runs inline, or
+    on a thread for aencode(), so it never blocks an event loop.
+    """
+
+    encoding: EncodeSettings
+
+    def __init__(self, encoder: EncoderPool | None = None):
+        self.encoder = encoder
+
+    @abstractmethod
+    def synthesize(self, text: str, prompt: str = "") -> bytes:
+        """Return raw mono LINEAR16 PCM at encoding.sample_rate; see generate()."""
+
+    async def asynthesize(self, text: str, prompt: str = "") -> bytes:
+        """Coroutine version of synthesize(); see AudioGenerator.agenerate()."""
+        return await asyncio.to_thread(self.synthesize, text, prompt)
+
+    def generate(self, text: str, prompt: str = "") -> bytes:
+        return self.encode(self.synthesize(text, prompt))
+
+    async def agenerate(self, text: str, prompt: str = "") -> bytes:
+        pcm = await self.asynthesize(text, prompt)
+        return await self.aencode(pcm)
+
+    def encode(self, pcm: bytes) -> bytes:
+        if self.encoder is not None:
+            return self.encoder.encode(pcm, self.encoding)
+        return to_mp3(pcm, self.encoding)
+
+    async def aencode(self, pcm: bytes) -> bytes:
+        """Coroutine version of encode(); inline encoding runs on a thread, not the loop."""
+        if self.encoder is not None:
+            return await asyncio.wrap_future(self.encoder.submit(pcm, self.encoding))
+        return await asyncio.to_thread(to_mp3, pcm, self.encoding)
+
+    def encode_async(self, pcm: bytes) -> Future:
+        """Like encode(), but returns a Future instead of waiting for the MP3."""
+        if self.encoder is not None:
+            return self.encoder.submit(pcm, self.encoding)
+        future: Future = Future()
+        try:
+            future.set_result(to_mp3(pcm, self.encoding))
+        except Exception as e:
+            future.set_exception(e)
+        return future
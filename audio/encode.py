@@ -0,0 +1,266 @@
+import multiprocessing
+import os
+import subprocess
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+
+from pydub import AudioSegment
+
+try:
+    import lameenc
+except ImportError:  # optional: without it, pool workers fall back to ffmpeg
+    lameenc = None
+
+SAMPLE_WIDTH = 2  # LINEAR16
+CHANNELS = 1
+# Seconds one card may take to encode, in ffmpeg or in a pool worker, before the
+# encoder is considered hung. Real cards take well under a second.
+ENCODE_TIMEOUT = 60.0
+
+
+class EncodeError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class EncodeSettings:
+    sample_rate: int
+    bitrate: str
+    speed: float = 1.0
+
+
+def _speedup(pcm: bytes, settings: EncodeSettings) -> bytes:
+    audio = AudioSegment(
+        data=pcm,
+        sample_width=SAMPLE_WIDTH,
+        frame_rate=settings.sample_rate,
+        channels=CHANNELS,
+    )
+    return audio.speedup(playback_speed=settings.speed).raw_data
+
+
+def to_mp3(pcm: bytes, settings: EncodeSettings) -> bytes:
+    """Encode raw mono LINEAR16 PCM to MP3.
+
+    The PCM is piped straight into ffmpeg's stdin and the MP3 read back from its
+    stdout, so there is no WAV container, no temp file, and no extra copy of the
+    audio beyond the input and output buffers. Speed changes still go through
+    pydub's speedup, on an in-memory AudioSegment, so SPEED != 1.0 sounds the same
+    as it always has.
+    """
+    if settings.speed != 1.0:
+        pcm = _speedup(pcm, settings)
+    return _ffmpeg_mp3(pcm, settings)
+
+
+def _ffmpeg_mp3(pcm: bytes, settings: EncodeSettings) -> bytes:
+    cmd = [
+        AudioSegment.converter,
+        "-hide_banner",
+        "-loglevel", "error",
+        "-f", "s16le",
+        "-ar", str(settings.sample_rate),
+        "-ac", str(CHANNELS),
+        "-i", "pipe:0",
+        "-b:a", settings.bitrate,
+        "-f", "mp3",
+        "pipe:1",
+    ]
+    try:
+        proc = subprocess.run(cmd, input=pcm, capture_output=True, timeout=ENCODE_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        raise EncodeError(f"ffmpeg did not finish within {ENCODE_TIMEOUT:g}s")
+    if proc.returncode != 0:
+        raise EncodeError(
+            f"ffmpeg exited with {proc.returncode}: {proc.stderr.decode(errors='replace').strip()}"
+        )
+    return proc.stdout
+
+
+def _lame_mp3(pcm: bytes, settings: EncodeSettings) -> bytes:
+    encoder = lameenc.Encoder()
+    encoder.set_bit_rate(int(settings.bitrate.rstrip("kK")))
+    encoder.set_in_sample_rate(settings.sample_rate)
+    encoder.set_channels(CHANNELS)
+    encoder.set_quality(3)  # LAME's default, and what ffmpeg's libmp3lame uses
+    return bytes(encoder.encode(pcm) + encoder.flush())
+
+
+def _worker_encode(pcm: bytes, settings: EncodeSettings) -> bytes:
+    if settings.speed != 1.0:
+        pcm = _speedup(pcm, settings)
+    if lameenc is not None:
+        return _lame_mp3(pcm, settings)
+    return _ffmpeg_mp3(pcm, settings)
+
+
+def _worker_ping() -> int:
+    return os.getpid()
+
+
+def _kill(executor: ProcessPoolExecutor) -> None:
+    """Kill the executor's workers; its unfinished futures fail with BrokenProcessPool."""
+    for process in list((executor._processes or {}).values()):
+        process.kill()
+
+
+class EncoderPool:
+    """Long-lived worker processes that turn PCM into MP3.
+
+    Each worker loads LAME once (through the optional `lameenc` package) and then
+    encodes in-process, so a card costs no process startup at all. Without lameenc,
+    workers still encode, but by spawning ffmpeg per card as to_mp3 does. PCM is sent
+    to a worker and MP3 comes back over the executor's pipes, without touching disk.
+
+    Speed changes run in the workers too, so submit() takes all of the CPU-bound
+    post-processing off the caller's thread. Only one card per worker is handed to
+    the executor at a time; the rest wait in the parent, so a card's deadline starts
+    when a worker is free to take it, not while it sits behind a backlog.
+
+    No processes are started until the first encode or check(), so a run that has
+    nothing to encode never pays for them.
+
+    A crashed worker breaks the underlying executor; the pool then starts a fresh
+    set of workers and retries the card once. A watchdog thread treats a card that
+    hasn't come back within `timeout` seconds as a hung worker and kills the
+    workers, which fails over the same way. check() pings every worker and
+    restarts the pool if any of them doesn't answer in time.
+    """
+
+    def __init__(self, workers: int, timeout: float = ENCODE_TIMEOUT):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._executor: ProcessPoolExecutor | None = None
+        # Each unfinished worker future -> (deadline, the executor running it).
+        self._deadlines: dict[Future, tuple[float, ProcessPoolExecutor]] = {}
+        # Cards not yet handed to an executor: (outer future, pcm, settings, retry).
+        self._waiting: deque[tuple[Future, bytes, EncodeSettings, bool]] = deque()
+        self._running = 0
+        self._closed = threading.Event()
+        self._watchdog: threading.Thread | None = None
+
+    def _current(self) -> ProcessPoolExecutor:
+        executor = self._executor
+        if executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = self._start()
+                    self._watchdog = threading.Thread(target=self._watch, daemon=True)
+                    self._watchdog.start()
+                executor = self._executor
+        return executor
+
+    def _start(self) -> ProcessPoolExecutor:
+        # spawn, not fork: the parent holds gRPC and HTTP threads that mustn't be
+        # duplicated into the workers.
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    def encode(self, pcm: bytes, settings: EncodeSettings) -> bytes:
+        return self.submit(pcm, settings).result()
+
+    def submit(self, pcm: bytes, settings: EncodeSettings) -> Future:
+        """Queue a card for encoding; the returned Future resolves to the MP3 bytes."""
+        outer: Future = Future()
+        with self._lock:
+            self._waiting.append((outer, pcm, settings, True))
+        self._dispatch()
+        return outer
+
+    def _dispatch(self) -> None:
+        """Hand waiting cards to the executor while a worker is free for each."""
+        while True:
+            with self._lock:
+                if self._running >= self.workers or not self._waiting:
+                    return
+                self._running += 1
+                card = self._waiting.popleft()
+            self._attempt(*card)
+
+    def _attempt(
+        self, outer: Future, pcm: bytes, settings: EncodeSettings, retry: bool
+    ) -> None:
+        executor = self._current()
+
+        def crashed(e: BrokenProcessPool) -> None:
+            self._restart(executor)
+            if retry:
+                with self._lock:
+                    self._waiting.appendleft((outer, pcm, settings, False))
+            else:
+                outer.set_exception(EncodeError(f"Encoder worker crashed twice: {e}"))
+
+        def done(inner: Future) -> None:
+            with self._lock:
+                self._deadlines.pop(inner, None)
+                self._running -= 1
+            try:
+                outer.set_result(inner.result())
+            except BrokenProcessPool as e:
+                crashed(e)
+            except Exception as e:
+                outer.set_exception(e)
+            self._dispatch()
+
+        try:
+            inner = executor.submit(_worker_encode, pcm, settings)
+        except BrokenProcessPool as e:
+            with self._lock:
+                self._running -= 1
+            crashed(e)
+            self._dispatch()
+            return
+        with self._lock:
+            self._deadlines[inner] = (time.monotonic() + self.timeout, executor)
+        inner.add_done_callback(done)
+
+    def _watch(self) -> None:
+        while not self._closed.wait(min(1.0, self.timeout)):
+            now = time.monotonic()
+            with self._lock:
+                hung = {
+                    executor
+                    for deadline, executor in self._deadlines.values()
+                    if deadline <= now
+                }
+            for executor in hung:
+                _kill(executor)
+
+    def check(self, timeout: float = 10.0) -> bool:
+        """Ping every worker; restart the pool and return False if any is unhealthy."""
+        executor = self._current()
+        try:
+            futures = [executor.submit(_worker_ping) for _ in range(self.workers)]
+            for future in futures:
+                future.result(timeout=timeout)
+            return True
+        except Exception:
+            self._restart(executor)
+            return False
+
+    def close(self) -> None:
+        self._closed.set()
+        with self._lock:
+            waiting, self._waiting = self._waiting, deque()
+        for outer, _, _, _ in waiting:
+            outer.set_exception(EncodeError("Encoder pool closed"))
+        if self._watchdog is not None:
+            self._watchdog.join()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def _restart(self, broken: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._executor is not broken:
+                return  # another thread already restarted it
+            # A hung worker wouldn't exit on shutdown alone.
+            _kill(broken)
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._start()
@@ -0,0 +1,133 @@
+import array
+import asyncio
+import hashlib
+import math
+import random
+import threading
+import time
+
+from .base import PcmAudioGenerator
+from .encode import SAMPLE_WIDTH, EncoderPool, EncodeSettings
+
+# The same output format as audio.gemini, without importing the Google client.
+SAMPLE_RATE = 24000
+BITRATE = "128k"
+SPEED = 1.0
+ENCODING = EncodeSettings(sample_rate=SAMPLE_RATE, bitrate=BITRATE, speed=SPEED)
+
+LATENCY = 0.5
+PER_CHAR = 0.01
+JITTER = 0.3
+SECONDS_PER_CHAR = 0.15
+
+
+class FakeServiceUnavailable(ConnectionError):
+    """A transient failure; RetryPolicy retries it like a 503 from the TTS API."""
+
+
+class FakeSynthesisError(Exception):
+    """A permanent failure, like a request the TTS API rejects."""
+
+
+def _voice(seed: int) -> bytes:
+    """One second of a voiced, vowel-like signal: harmonics under a syllable envelope.
+
+    Random bytes or silence would make LAME's work unrealistically hard or easy; this
+    keeps the MP3 encode close to what real speech costs.
+    """
+    rng = random.Random(seed)
+    samples = array.array("h")
+    for i in range(SAMPLE_RATE):
+        t = i / SAMPLE_RATE
+        pitch = 180 + 40 * math.sin(2 * math.pi * 0.7 * t)
+        envelope = 0.5 + 0.5 * math.sin(2 * math.pi * 6 * t)
+        value = sum(
+            math.sin(2 * math.pi * pitch * h * t) / h for h in (1, 2, 3, 5)
+        ) * envelope * 0.25 + rng.gauss(0, 0.02)
+        samples.append(max(-32767, min(32767, int(value * 32767))))
+    return samples.tobytes()
+
+
+class FakeAudioGenerator(PcmAudioGenerator):
+    """A stand-in TTS provider for offline benchmarks: no network, no credentials.
+
+    Each call waits latency + per_char * len(text) seconds, scaled by a log-normal
+    factor with sigma jitter (0 for a fixed latency), and returns seconds_per_char
+    seconds of PCM per character of text. The PCM then goes through the real
+    encode()/encode_async()/aencode() path, so the encoder pool and inline encoding
+    cost what they do in production.
+
+    failure_rate of attempts raise FakeServiceUnavailable, which RetryPolicy retries,
+    and fatal_rate raise FakeSynthesisError, which it doesn't. Latencies and failures
+    are drawn from the seed, the text and the attempt number, not from a shared
+    stream, so a run is reproducible however its calls are scheduled.
+    """
+
+    encoding = ENCODING
+
+    def __init__(
+        self,
+        encoder: EncoderPool | None = None,
+        latency: float = LATENCY,
+        per_char: float = PER_CHAR,
+        jitter: float = JITTER,
+        seconds_per_char: float = SECONDS_PER_CHAR,
+        failure_rate: float = 0.0,
+        fatal_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        super().__init__(encoder)
+        self.latency = latency
+        self.per_char = per_char
+        self.jitter = jitter
+        self.seconds_per_char = seconds_per_char
+        self.failure_rate = failure_rate
+        self.fatal_rate = fatal_rate
+        self.seed = seed
+        self.calls = 0
+        self.failures = 0
+        self._attempts: dict[tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+        self._voice = _voice(seed)
+
+    def synthesize(self, text: str, prompt: str = "") -> bytes:
+        delay, error = self._draw(text, prompt)
+        time.sleep(delay)
+        if error is not None:
+            raise error
+        return self._pcm(text)
+
+    async def asynthesize(self, text: str, prompt: str = "") -> bytes:
+        delay, error = self._draw(text, prompt)
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return self._pcm(text)
+
+    def _draw(self, text: str, prompt: str) -> tuple[float, Exception | None]:
+        with self._lock:
+            self.calls += 1
+            attempt = self._attempts.get((text, prompt), 0)
+            self._attempts[(text, prompt)] = attempt + 1
+        digest = hashlib.blake2b(
+            f"{self.seed}\0{attempt}\0{prompt}\0{text}".encode(), digest_size=8
+        ).digest()
+        rng = random.Random(int.from_bytes(digest, "big"))
+        delay = (self.latency + self.per_char * len(text)) * rng.lognormvariate(
+            0, self.jitter
+        )
+        roll = rng.random()
+        error: Exception | None = None
+        if roll < self.fatal_rate:
+            error = FakeSynthesisError(f"fake TTS rejected {text[:20]!r}")
+        elif roll < self.fatal_rate + self.failure_rate:
+            error = FakeServiceUnavailable("fake TTS unavailable")
+        if error is not None:
+            with self._lock:
+                self.failures += 1
+        return delay, error
+
+    def _pcm(self, text: str) -> bytes:
+        size = int(len(text) * self.seconds_per_char * SAMPLE_RATE) * SAMPLE_WIDTH
+        repeats, rest = divmod(size, len(self._voice))
+        return self._voice * repeats + self._voice[:rest]
@@ -1,79 +1,76 @@
-import io
-import os
-import tempfile
-import wave
-
 from google.cloud import texttospeech
-from pydub import AudioSegment
 
-from .base import AudioGenerator
+from .base import PcmAudioGenerator
+from .encode import EncoderPool, EncodeSettings
 
 SPEAKER = "Kore"
 MODEL = "gemini-3.1-flash-tts-preview"
 SAMPLE_RATE = 24000
 BITRATE = "128k"
 SPEED = 1.0
+ENCODING = EncodeSettings(sample_rate=SAMPLE_RATE, bitrate=BITRATE, speed=SPEED)
 
 
-def _make_client() -> texttospeech.TextToSpeechClient:
+def _client_options():
     from google.api_core import client_options as client_options_lib
 
-    opts = client_options_lib.ClientOptions(
+    return client_options_lib.ClientOptions(
         api_endpoint="texttospeech.googleapis.com",
     )
-    return texttospeech.TextToSpeechClient(client_options=opts)
 
 
-def _pcm_to_wav(pcm: bytes, sample_rate: int = SAMPLE_RATE) -> bytes:
-    buf = io.BytesIO()
-    with wave.open(buf, "wb") as wf:
-        wf.setnchannels(1)
-        wf.setsampwidth(2)  # 16-bit = 2 bytes
-        wf.setframerate(sample_rate)
-        wf.writeframes(pcm)
-    return buf.getvalue()
+def _make_client() -> texttospeech.TextToSpeechClient:
+    return texttospeech.TextToSpeechClient(client_options=_client_options())
+
 
+def _make_async_client() -> texttospeech.TextToSpeechAsyncClient:
+    return texttospeech.TextToSpeechAsyncClient(client_options=_client_options())
 
-class GeminiAudioGenerator(AudioGenerator):
-    def __init__(self):
+
+def _build_request(text: str, prompt: str) -> texttospeech.SynthesizeSpeechRequest:
+    if prompt:
+        synthesis_input = texttospeech.SynthesisInput(text=text, prompt=prompt)
+    else:
+        synthesis_input = texttospeech.SynthesisInput(text=text)
+    voice = texttospeech.VoiceSelectionParams(
+        language_code="ja-JP",
+        name=SPEAKER,
+        model_name=MODEL,
+    )
+    audio_config = texttospeech.AudioConfig(
+        audio_encoding=texttospeech.AudioEncoding.LINEAR16,
+        sample_rate_hertz=SAMPLE_RATE,
+    )
+    return texttospeech.SynthesizeSpeechRequest(
+        input=synthesis_input,
+        voice=voice,
+        audio_config=audio_config,
+    )
+
+
+class GeminiAudioGenerator(PcmAudioGenerator):
+    encoding = ENCODING
+
+    def __init__(self, encoder: EncoderPool | None = None):
+        super().__init__(encoder)
         self._client = _make_client()
+        self._async_client: texttospeech.TextToSpeechAsyncClient | None = None
 
-    def generate(self, text: str, prompt: str = "") -> bytes:
-        if prompt:
-            synthesis_input = texttospeech.SynthesisInput(text=text, prompt=prompt)
-        else:
-            synthesis_input = texttospeech.SynthesisInput(text=text)
-        voice = texttospeech.VoiceSelectionParams(
-            language_code="ja-JP",
-            name=SPEAKER,
-            model_name=MODEL,
-        )
-        audio_config = texttospeech.AudioConfig(
-            audio_encoding=texttospeech.AudioEncoding.LINEAR16,
-            sample_rate_hertz=SAMPLE_RATE,
-        )
+    def synthesize(self, text: str, prompt: str = "") -> bytes:
+        response = self._client.synthesize_speech(request=_build_request(text, prompt))
+        return response.audio_content
 
-        response = self._client.synthesize_speech(
-            request=texttospeech.SynthesizeSpeechRequest(
-                input=synthesis_input,
-                voice=voice,
-                audio_config=audio_config,
-            )
+    async def asynthesize(self, text: str, prompt: str = "") -> bytes:
+        # The async client's gRPC channel belongs to the loop it was created on, so it
+        # is made lazily from inside that loop.
+        if self._async_client is None:
+            self._async_client = _make_async_client()
+        response = await self._async_client.synthesize_speech(
+            request=_build_request(text, prompt)
         )
+        return response.audio_content
 
-        wav_bytes = _pcm_to_wav(response.audio_content)
-        return self._to_mp3(wav_bytes)
-
-    def _to_mp3(self, wav_bytes: bytes) -> bytes:
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as f:
-            f.write(wav_bytes)
-            tmp_path = f.name
-        try:
-            audio = AudioSegment.from_wav(tmp_path)
-            if SPEED != 1.0:
-                audio = audio.speedup(playback_speed=SPEED)
-            buf = io.BytesIO()
-            audio.export(buf, format="mp3", bitrate=BITRATE)
-            return buf.getvalue()
-        finally:
-            os.unlink(tmp_path)
+    async def aclose(self) -> None:
+        if self._async_client is not None:
+            await self._async_client.transport.close()
+            self._async_client = None
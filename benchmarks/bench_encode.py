@@ -0,0 +1,147 @@
+"""MP3 encode benchmarks: per-card latency and memory, and encode-stage throughput.
+
+    python -m benchmarks.bench_encode --cards 50 --seconds 4 --concurrency 8
+
+Latency: the old temp-WAV path vs. the in-memory pipe, each in its own child process
+so its peak RSS is measured separately. Peak Python heap per card (tracemalloc) shows
+the buffer copies each path makes; ffmpeg's own memory isn't included.
+
+Throughput: cards/sec for the encode stage alone, with --concurrency callers feeding
+either to_mp3 (one ffmpeg process per card) or an EncoderPool of that many workers.
+"""
+import argparse
+import io
+import json
+import math
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import wave
+
+from concurrent.futures import ThreadPoolExecutor
+
+from audio.encode import EncoderPool, lameenc, to_mp3
+from audio.gemini import BITRATE, ENCODING, SAMPLE_RATE, SPEED
+
+MODES = ("legacy", "pipe")
+
+
+def synthetic_pcm(seconds: float, sample_rate: int = SAMPLE_RATE) -> bytes:
+    """A speech-length tone sweep; MP3 cost depends on duration, not content."""
+    frames = int(seconds * sample_rate)
+    buf = bytearray()
+    for i in range(frames):
+        t = i / sample_rate
+        sample = int(8000 * math.sin(2 * math.pi * (200 + 150 * math.sin(t)) * t))
+        buf += sample.to_bytes(2, "little", signed=True)
+    return bytes(buf)
+
+
+def legacy_to_mp3(pcm: bytes) -> bytes:
+    """The encode path before audio.encode: WAV in memory, temp file, pydub export."""
+    from pydub import AudioSegment
+
+    wav = io.BytesIO()
+    with wave.open(wav, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(SAMPLE_RATE)
+        wf.writeframes(pcm)
+    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as f:
+        f.write(wav.getvalue())
+        tmp_path = f.name
+    try:
+        audio = AudioSegment.from_wav(tmp_path)
+        if SPEED != 1.0:
+            audio = audio.speedup(playback_speed=SPEED)
+        buf = io.BytesIO()
+        audio.export(buf, format="mp3", bitrate=BITRATE)
+        return buf.getvalue()
+    finally:
+        os.unlink(tmp_path)
+
+
+def run_mode(mode: str, cards: int, seconds: float) -> dict:
+    pcm = synthetic_pcm(seconds)
+    encode = legacy_to_mp3 if mode == "legacy" else lambda data: to_mp3(data, ENCODING)
+    encode(pcm)  # warm-up
+    latencies = []
+    for _ in range(cards):
+        start = time.perf_counter()
+        encode(pcm)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+
+    tracemalloc.start()
+    encode(pcm)
+    _, peak_heap = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "mode": mode,
+        "cards": cards,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+        "pcm_bytes": len(pcm),
+        "peak_heap_bytes": peak_heap,
+        # ru_maxrss is KiB on Linux, bytes on macOS.
+        "peak_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def throughput(encode, pcm: bytes, cards: int, concurrency: int) -> float:
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(encode, [pcm] * concurrency))  # warm-up
+        start = time.perf_counter()
+        list(pool.map(encode, [pcm] * cards))
+        return cards / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cards", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=4.0, help="Audio length per card")
+    parser.add_argument("--concurrency", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.cards, args.seconds)))
+        return
+
+    unit = "B" if sys.platform == "darwin" else "KiB"
+    print(f"{args.cards} cards, {args.seconds:g}s of audio each")
+    for mode in MODES:
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_encode", "--mode", mode,
+             "--cards", str(args.cards), "--seconds", str(args.seconds)],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        r = json.loads(out)
+        print(
+            f"  {mode:<7} mean {r['mean_ms']:7.1f} ms  p95 {r['p95_ms']:7.1f} ms  "
+            f"heap/card {r['peak_heap_bytes'] / r['pcm_bytes']:4.1f}x PCM  "
+            f"peak RSS {r['peak_rss']} {unit}"
+        )
+
+    pcm = synthetic_pcm(args.seconds)
+    n = args.concurrency
+    backend = "lameenc" if lameenc is not None else "ffmpeg"
+    print(f"Encode-stage throughput, {n} concurrent")
+    rate = throughput(lambda data: to_mp3(data, ENCODING), pcm, args.cards, n)
+    print(f"  to_mp3          {rate:7.1f} cards/sec")
+    encoder = EncoderPool(n)
+    try:
+        rate = throughput(lambda data: encoder.encode(data, ENCODING), pcm, args.cards, n)
+    finally:
+        encoder.close()
+    print(f"  EncoderPool     {rate:7.1f} cards/sec ({backend} workers)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""cardsInfo fetch wall-clock: sequential fixed batches vs. a parallel adaptive window.
+
+    python -m benchmarks.bench_fetch --cards 10000 50000 100000 --windows 1 2 4
+
+Serves a synthetic deck from fake_anki in a child process. Like the real add-on, it
+handles one request at a time on a single "main thread": each request costs a fixed
+overhead plus a per-card cost, and responses carry full cardsInfo records. The client
+side is AnkiClient.cards_info as Processor uses it, consumed batch by batch, so the
+numbers include JSON parsing.
+"""
+import argparse
+import multiprocessing
+import socket
+import time
+
+import anki
+import fake_anki
+from anki import AnkiClient
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_until_up(port: int) -> None:
+    # The child builds the whole synthetic deck before it starts listening.
+    for _ in range(1200):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("stand-in AnkiConnect did not start")
+
+
+def fetch(url: str, window: int, batch_size: int | None) -> dict:
+    client = AnkiClient(url=url, fetch_window=window, batch_size=batch_size)
+    try:
+        start = time.perf_counter()
+        ids = client.find_cards(fake_anki.DECK)
+        records = batches = 0
+        last = -1
+        sizes = []
+        for batch in client.cards_info(ids):
+            assert batch[0]["cardId"] > last, "batches out of order"
+            last = batch[-1]["cardId"]
+            records += len(batch)
+            batches += 1
+            sizes.append(len(batch))
+        elapsed = time.perf_counter() - start
+    finally:
+        client.close()
+    assert records == len(ids)
+    return {"seconds": elapsed, "batches": batches, "max_batch": max(sizes, default=0)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cards", type=int, nargs="+", default=[10_000, 50_000, 100_000])
+    parser.add_argument("--windows", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument(
+        "--overhead", type=float, default=0.02, help="Seconds per request on the server"
+    )
+    parser.add_argument(
+        "--per-card", type=float, default=0.0002, help="Seconds per card on the server"
+    )
+    args = parser.parse_args()
+
+    configs = [("sequential", 1, anki.BATCH_SIZE)] + [
+        (f"window {w}", w, None) for w in args.windows
+    ]
+    print(
+        f"{args.overhead * 1000:g} ms per request + {args.per_card * 1000:g} ms per card "
+        f"on the server, start batch {anki.BATCH_SIZE}"
+    )
+    for cards in args.cards:
+        port = _free_port()
+        behavior = fake_anki.Behavior(latency=args.overhead, per_item=args.per_card)
+        server = multiprocessing.Process(
+            target=fake_anki.serve, args=(port, cards, behavior), daemon=True
+        )
+        server.start()
+        try:
+            _wait_until_up(port)
+            print(f"{cards} cards")
+            for label, window, batch_size in configs:
+                r = fetch(f"http://127.0.0.1:{port}", window, batch_size)
+                mode = "fixed" if batch_size else "adaptive"
+                print(
+                    f"  {label:<11} {mode:<8} {r['seconds']:7.2f}s  "
+                    f"{cards / r['seconds']:9.0f} cards/sec  "
+                    f"{r['batches']:4} batches (largest {r['max_batch']})"
+                )
+        finally:
+            server.terminate()
+            server.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""End-to-end Processor.run throughput in every pipeline mode, fully offline.
+
+    python -m benchmarks.bench_pipeline --cards 2000 --concurrency 50 --encoders 0 2
+
+Runs against fake_anki's stand-in AnkiConnect (on a thread in this process, with a
+fresh synthetic deck per run) and audio.fake.FakeAudioGenerator, whose PCM goes
+through the real MP3 encode, inline or in an EncoderPool. Each mode gets its own
+output directory, so no run sees another's cache, journal or card index. With the
+same --seed, two runs make the same TTS calls and fail the same ones.
+"""
+import argparse
+import contextlib
+import io
+import tempfile
+import time
+from pathlib import Path
+
+import fake_anki
+import replacements as rpl
+from anki import AnkiClient
+from audio.encode import EncoderPool
+from audio.fake import FakeAudioGenerator
+from processor import Processor
+from retry import RetryPolicy
+
+REPLACEMENTS_FILE = Path(__file__).parent.parent / "replacements.json"
+HINTS_FILE = Path(__file__).parent.parent / "hints.json"
+
+
+def run_mode(
+    mode: str, concurrency: int, encoders: int, args: argparse.Namespace
+) -> dict:
+    collection = fake_anki.synthetic_deck(args.cards, seed=args.seed)
+    anki_server = fake_anki.FakeAnkiServer(fake_anki.FakeAnkiConnect(collection))
+    encoder = EncoderPool(encoders) if encoders else None
+    generator = FakeAudioGenerator(
+        encoder=encoder,
+        latency=args.latency,
+        jitter=args.jitter,
+        failure_rate=args.failure_rate,
+        seed=args.seed,
+    )
+    kwargs = {"workers": concurrency} if mode == "threads" else {"async_requests": concurrency}
+    with anki_server, tempfile.TemporaryDirectory(prefix="bench_pipeline_") as output_dir:
+        client = AnkiClient(url=anki_server.url)
+        proc = Processor(
+            anki=client,
+            generator=generator,
+            replacements_data=rpl.load(REPLACEMENTS_FILE),
+            hints_data=rpl.load(HINTS_FILE),
+            use_cache=False,
+            retry=RetryPolicy(base_delay=0.05, budget=args.cards),
+            output_dir=Path(output_dir),
+            **kwargs,
+        )
+        try:
+            if encoder is not None:
+                encoder.check()  # start the workers before the clock does
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                proc.run(fake_anki.DECK)
+            elapsed = time.perf_counter() - start
+        finally:
+            proc.close()
+            client.close()
+            if encoder is not None:
+                encoder.close()
+    return {
+        "seconds": elapsed,
+        "cards_per_sec": args.cards / elapsed,
+        "calls": generator.calls,
+        "failures": generator.failures,
+        "failed_jobs": len(proc._failed),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cards", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[50])
+    parser.add_argument("--encoders", type=int, nargs="+", default=[0, 2])
+    parser.add_argument(
+        "--modes", nargs="+", choices=["threads", "async"], default=["threads", "async"]
+    )
+    parser.add_argument("--latency", type=float, default=0.2, help="Base seconds per TTS call")
+    parser.add_argument("--jitter", type=float, default=0.3, help="Log-normal sigma of the latency")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Transient TTS failures")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(
+        f"{args.cards} cards, {args.latency:g}s base TTS latency (sigma {args.jitter:g}), "
+        f"{args.failure_rate:.0%} transient failures"
+    )
+    for concurrency in args.concurrency:
+        for encoders in args.encoders:
+            for mode in args.modes:
+                r = run_mode(mode, concurrency, encoders, args)
+                encode = f"encoders x{encoders}" if encoders else "inline encode"
+                print(
+                    f"  {mode:<7} x{concurrency:<4} {encode:<14} {r['seconds']:7.2f}s  "
+                    f"{r['cards_per_sec']:7.1f} cards/sec  {r['calls']} calls, "
+                    f"{r['failures']} failed, {r['failed_jobs']} jobs lost"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Synthesis-stage throughput: thread pool (--workers) vs. asyncio (--async).
+
+    python -m benchmarks.bench_synthesis --jobs 2000 --latency 0.5 --concurrency 50 200
+
+Drives Processor._synthesize with a generator that only waits (time.sleep in
+generate, asyncio.sleep in agenerate) and returns a few bytes, so the numbers
+measure how many TTS calls each mode keeps in flight and what that costs in threads,
+not the network or the encoder.
+"""
+import argparse
+import asyncio
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from audio.base import AudioGenerator
+from processor import AudioJob, Processor
+
+
+class SleepGenerator(AudioGenerator):
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def generate(self, text: str, prompt: str = "") -> bytes:
+        time.sleep(self.latency)
+        return b"ID3"
+
+    async def agenerate(self, text: str, prompt: str = "") -> bytes:
+        await asyncio.sleep(self.latency)
+        return b"ID3"
+
+
+def run_mode(mode: str, concurrency: int, jobs: list[AudioJob], latency: float) -> dict:
+    kwargs = {"workers": concurrency} if mode == "threads" else {"async_requests": concurrency}
+    with tempfile.TemporaryDirectory(prefix="bench_synthesis_") as output_dir:
+        proc = Processor(
+            anki=None,
+            generator=SleepGenerator(latency),
+            replacements_data={},
+            hints_data={},
+            use_cache=False,
+            output_dir=Path(output_dir),
+            **kwargs,
+        )
+        try:
+            peak_threads = threading.active_count()
+            start = time.perf_counter()
+            for _ in proc._synthesize(jobs):
+                peak_threads = max(peak_threads, threading.active_count())
+            elapsed = time.perf_counter() - start
+        finally:
+            proc.close()
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "seconds": elapsed,
+        "jobs_per_sec": len(jobs) / elapsed,
+        "peak_threads": peak_threads,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per fake TTS call")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 50, 200])
+    args = parser.parse_args()
+
+    jobs = [
+        AudioJob(
+            audio_hash=f"{i:016x}",
+            audio_filename=f"speech_{i:016x}.mp3",
+            spoken_text="テスト",
+            prompt="",
+        )
+        for i in range(args.jobs)
+    ]
+    print(f"{args.jobs} jobs, {args.latency:g}s per call")
+    for concurrency in args.concurrency:
+        for mode in ("threads", "async"):
+            r = run_mode(mode, concurrency, jobs, args.latency)
+            print(
+                f"  {mode:<7} x{concurrency:<4} {r['seconds']:6.2f}s  "
+                f"{r['jobs_per_sec']:8.1f} jobs/sec  peak threads {r['peak_threads']}"
+            )
+
+
+if __name__ == "__main__":
+    main()
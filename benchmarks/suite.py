@@ -0,0 +1,326 @@
+"""Benchmark suite: every hot path timed in one go, with results kept as JSON.
+
+    python -m benchmarks.suite run --out results.json
+    python -m benchmarks.suite compare baseline.json results.json --threshold 0.10
+
+run times each case --repeat times and keeps the fastest, which is the least noisy
+figure on a shared machine. The JSON records the machine (CPU count, Python,
+platform, lameenc, git commit) next to the numbers, since results are only
+comparable on the same box. compare lines two result files up case by case and
+exits non-zero if any case got slower by more than --threshold.
+
+Cases: _build over a synthetic deck; CompiledRules.applicable + apply_readings with
+dictionaries of several sizes, over a deck's spread of Sources; hasher.compute; MP3
+encode, inline and in-process LAME; cards_info fetch from fake_anki; and a full
+Processor.run against fake_anki and FakeAudioGenerator (see bench_pipeline).
+--quick shrinks every case for a smoke run.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from collections.abc import Callable
+from datetime import datetime, timezone
+from pathlib import Path
+
+import fake_anki
+import hasher
+import processor
+import replacements as rpl
+from anki import AnkiClient
+from audio import encode
+from audio.fake import FakeAudioGenerator
+
+from . import bench_pipeline
+
+SUITE_VERSION = 2
+THRESHOLD = 0.10
+DICTIONARY_SIZES = (10, 100, 1000, 10000)
+
+_KANJI = "日月火水木金土山川田人口目耳手足力男女子学生先年円上下中大小本文字名"
+
+
+def _cards(count: int) -> list[dict]:
+    """cardsInfo records for a synthetic deck, as AnkiConnect would return them."""
+    collection = fake_anki.synthetic_deck(count)
+    return [collection.card_info(card_id) for card_id in collection.find_cards("")]
+
+
+def _dictionary(size: int, rng: random.Random) -> dict:
+    """size global entries, plus smaller series, volume and page scopes.
+
+    Laid out like a real replacements.json: most names under "*", a tenth as many
+    per series, and a few per volume and per page across fake_anki's Sources.
+    """
+
+    def scope(count: int, reading: str) -> dict:
+        return {
+            "".join(rng.choices(_KANJI, k=rng.randint(2, 4))): reading
+            for _ in range(max(1, count))
+        }
+
+    data: dict = {"*": scope(size, "ア")}
+    for series in fake_anki.SERIES:
+        data[series] = {"*": scope(size // 10, "イ")}
+        for volume in range(1, fake_anki.VOLUMES + 1):
+            data[series][f"V{volume}"] = {
+                "*": scope(size // 100, "ウ"),
+                **{
+                    f"P{page}": scope(3, "エ")
+                    for page in rng.sample(range(1, fake_anki.PAGES + 1), 10)
+                },
+            }
+    return data
+
+
+def _timed(fn: Callable[[], int], repeat: int) -> dict:
+    """Run fn repeat times; fn returns how many items it processed."""
+    best = float("inf")
+    items = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        items = fn()
+        best = min(best, time.perf_counter() - start)
+    return {"seconds": best, "items": items, "per_sec": items / best if best else 0.0}
+
+
+def bench_build(scale: float, repeat: int) -> dict[str, dict]:
+    cards = _cards(int(20_000 * scale))
+    repl_data = rpl.load(bench_pipeline.REPLACEMENTS_FILE)
+    hints_data = rpl.load(bench_pipeline.HINTS_FILE)
+
+    def run() -> int:
+        # Fresh rules each time, so the per-Source merge cache starts cold as in a run.
+        repl_rules, hint_rules = rpl.CompiledRules(repl_data), rpl.CompiledRules(hints_data)
+        for card in cards:
+            processor._build(card, repl_rules, hint_rules)
+        return len(cards)
+
+    return {"build": _timed(run, repeat)}
+
+
+def bench_rules(scale: float, repeat: int) -> dict[str, dict]:
+    rng = random.Random(0)
+    cards = [
+        (
+            processor._strip_html(processor._field(card, processor.SENTENCE_FIELD)),
+            processor._field(card, processor.SOURCE_FIELD),
+        )
+        for card in _cards(int(10_000 * scale))
+    ]
+    results = {}
+    for size in DICTIONARY_SIZES:
+        data = _dictionary(size, rng)
+        # Plant some of the global names so there is something to substitute.
+        words = list(data["*"])
+        texts = [
+            (sentence + rng.choice(words) if i % 4 == 0 else sentence, source)
+            for i, (sentence, source) in enumerate(cards)
+        ]
+
+        def run() -> int:
+            # Fresh rules each time: compiling them and the per-Source lookups that a
+            # deck spread over thousands of pages needs are part of every run.
+            rules = rpl.CompiledRules(data)
+            for text, source in texts:
+                rpl.apply_readings(text, rules.applicable(text, source))
+            return len(texts)
+
+        results[f"rules[{size}]"] = _timed(run, repeat)
+    return results
+
+
+def bench_hash(scale: float, repeat: int) -> dict[str, dict]:
+    count = int(50_000 * scale)
+    pairs = [("曲", "マガリ"), ("兎子", "ウサコ")]
+    sentences = [f"兎子が曲と{i}回会った。" for i in range(count)]
+
+    def run() -> int:
+        for sentence in sentences:
+            hasher.compute(sentence, pairs, pairs[:1])
+        return count
+
+    return {"hash": _timed(run, repeat)}
+
+
+def bench_encode(scale: float, repeat: int) -> dict[str, dict]:
+    count = max(2, int(20 * scale))
+    # About four seconds of speech each, the length of a typical sentence.
+    pcm = FakeAudioGenerator()._pcm("あ" * 27)
+    settings = FakeAudioGenerator.encoding
+    results = {}
+
+    def inline() -> int:
+        for _ in range(count):
+            encode.to_mp3(pcm, settings)
+        return count
+
+    results["encode[ffmpeg]"] = _timed(inline, repeat)
+    if encode.lameenc is not None:
+
+        def lame() -> int:
+            for _ in range(count):
+                encode._worker_encode(pcm, settings)
+            return count
+
+        results["encode[lame]"] = _timed(lame, repeat)
+    return results
+
+
+def bench_fetch(scale: float, repeat: int) -> dict[str, dict]:
+    collection = fake_anki.synthetic_deck(int(20_000 * scale))
+    with fake_anki.FakeAnkiServer(fake_anki.FakeAnkiConnect(collection)) as server:
+        client = AnkiClient(url=server.url)
+        try:
+            ids = client.find_cards(fake_anki.DECK)
+
+            def run() -> int:
+                return sum(len(batch) for batch in client.cards_info(ids))
+
+            return {"fetch": _timed(run, repeat)}
+        finally:
+            client.close()
+
+
+def bench_pipeline_run(scale: float, repeat: int) -> dict[str, dict]:
+    args = argparse.Namespace(
+        cards=max(20, int(500 * scale)), latency=0.05, jitter=0.3, failure_rate=0.0, seed=0
+    )
+    results = {}
+    for mode, encoders in (("threads", 0), ("async", 0), ("threads", 2)):
+        runs = [bench_pipeline.run_mode(mode, 50, encoders, args) for _ in range(repeat)]
+        best = min(runs, key=lambda r: r["seconds"])
+        results[f"pipeline[{mode},encoders={encoders}]"] = {
+            "seconds": best["seconds"],
+            "items": args.cards,
+            "per_sec": best["cards_per_sec"],
+        }
+    return results
+
+
+CASES: dict[str, Callable[[float, int], dict[str, dict]]] = {
+    "build": bench_build,
+    "rules": bench_rules,
+    "hash": bench_hash,
+    "encode": bench_encode,
+    "fetch": bench_fetch,
+    "pipeline": bench_pipeline_run,
+}
+
+
+def machine() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": sys.version.split()[0],
+        "lameenc": encode.lameenc is not None,
+        "commit": commit or None,
+    }
+
+
+def run(args: argparse.Namespace) -> None:
+    scale = 0.1 if args.quick else 1.0
+    results: dict[str, dict] = {}
+    for name in args.cases:
+        print(f"{name}...", flush=True)
+        for case, r in CASES[name](scale, args.repeat).items():
+            results[case] = r
+            print(f"  {case:<32} {r['seconds']:8.3f}s  {r['per_sec']:11.1f}/sec")
+    report = {
+        "version": SUITE_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "scale": scale,
+        "repeat": args.repeat,
+        "machine": machine(),
+        "results": results,
+    }
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        print(f"Wrote {args.out}")
+
+
+def compare(args: argparse.Namespace) -> int:
+    base = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+    new = json.loads(Path(args.results).read_text(encoding="utf-8"))
+    for key in ("cpu_count", "python", "platform"):
+        if base["machine"].get(key) != new["machine"].get(key):
+            print(
+                f"Warning: {key} differs ({base['machine'].get(key)} vs "
+                f"{new['machine'].get(key)}); timings may not be comparable."
+            )
+    if base.get("version") != new.get("version"):
+        print("Warning: the two runs come from different suite versions; cases may differ.")
+    if base.get("scale") != new.get("scale"):
+        print("Warning: the two runs used different scales.")
+
+    regressions = []
+    for case, r in new["results"].items():
+        old = base["results"].get(case)
+        if old is None:
+            print(f"  {case:<32} {r['seconds']:8.3f}s  (new)")
+            continue
+        change = r["seconds"] / old["seconds"] - 1 if old["seconds"] else 0.0
+        flag = ""
+        if change > args.threshold:
+            flag = "  REGRESSION"
+            regressions.append(case)
+        print(
+            f"  {case:<32} {old['seconds']:8.3f}s -> {r['seconds']:8.3f}s  "
+            f"{change:+7.1%}{flag}"
+        )
+    for case in sorted(base["results"].keys() - new["results"].keys()):
+        print(f"  {case:<32} missing from {args.results}")
+
+    if regressions:
+        print(f"{len(regressions)} case(s) slower by more than {args.threshold:.0%}.")
+        return 1
+    print(f"No case slower by more than {args.threshold:.0%}.")
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="Run the suite")
+    run_parser.add_argument("--out", help="Write the results to this JSON file")
+    run_parser.add_argument(
+        "--cases", nargs="+", choices=list(CASES), default=list(CASES), metavar="CASE"
+    )
+    run_parser.add_argument("--repeat", type=int, default=3)
+    run_parser.add_argument("--quick", action="store_true", help="Smaller inputs")
+
+    compare_parser = sub.add_parser("compare", help="Compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("results")
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=THRESHOLD,
+        help="Flag cases slower than the baseline by more than this fraction",
+    )
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+    else:
+        sys.exit(compare(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# A .tmp file this old was left by a write that never finished, not one in progress.
+STALE_TMP_SECONDS = 3600.0
+
+
+def _looks_like_mp3(data: bytes) -> bool:
+    """Cheap integrity check: an ID3 tag or an MPEG audio frame sync at the start."""
+    if data.startswith(b"ID3"):
+        return True
+    return len(data) >= 2 and data[0] == 0xFF and data[1] & 0xE0 == 0xE0
+
+
+class AudioCache:
+    """speech_<hash>.mp3 files kept on disk and reused instead of calling the TTS API.
+
+    The hash in the filename covers everything that reaches the TTS API, so a file
+    that exists and passes the integrity check is the audio a new synthesis would be
+    asked for. Files are written atomically, a hit refreshes the file's mtime, and
+    once the directory grows past max_bytes the least recently used files are evicted
+    down to 90% of the limit. Temp files orphaned by a crash mid-write are removed
+    when the cache is opened, since eviction never sees them.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._remove_stale_tmp()
+        self._total = sum(path.stat().st_size for path in self._files())
+
+    def get(self, filename: str) -> bytes | None:
+        path = self.directory / filename
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        if not _looks_like_mp3(data):
+            self._remove(path)
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return data
+
+    def put(self, filename: str, data: bytes) -> None:
+        path = self.directory / filename
+        previous = path.stat().st_size if path.exists() else 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        with self._lock:
+            self._total += len(data) - previous
+            over = self._total > self.max_bytes
+        if over:
+            self._evict()
+
+    def _files(self) -> list[Path]:
+        return list(self.directory.glob("speech_*.mp3"))
+
+    def _remove_stale_tmp(self) -> None:
+        cutoff = time.time() - STALE_TMP_SECONDS
+        for path in self.directory.glob("*.tmp"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _remove(self, path: Path) -> None:
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except FileNotFoundError:
+            return
+        with self._lock:
+            self._total -= size
+
+    def _evict(self) -> None:
+        entries = []
+        for path in self._files():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+        with self._lock:
+            self._total = total
@@ -0,0 +1,299 @@
+import json
+import sqlite3
+from collections.abc import Iterable
+from dataclasses import dataclass
+from pathlib import Path
+
+import replacements as rpl
+
+# Bumped whenever the tables change shape; an index with another version is rebuilt.
+_SCHEMA_VERSION = 1
+_TABLES = ("notes", "matches", "rules", "snapshots")
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS notes (
+    deck TEXT NOT NULL,
+    note_id INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    sentence TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    rules TEXT NOT NULL,
+    audio_hash TEXT NOT NULL,
+    PRIMARY KEY (deck, note_id)
+);
+CREATE TABLE IF NOT EXISTS matches (
+    deck TEXT NOT NULL,
+    note_id INTEGER NOT NULL,
+    original TEXT NOT NULL,
+    PRIMARY KEY (deck, note_id, original)
+);
+CREATE INDEX IF NOT EXISTS matches_by_original ON matches (deck, original);
+CREATE TABLE IF NOT EXISTS rules (
+    deck TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    original TEXT NOT NULL,
+    reading TEXT NOT NULL,
+    PRIMARY KEY (deck, kind, scope, original)
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    deck TEXT PRIMARY KEY,
+    settings TEXT NOT NULL
+);
+CREATE TEMP TABLE IF NOT EXISTS staged_seen (note_id INTEGER PRIMARY KEY);
+CREATE TEMP TABLE IF NOT EXISTS staged_notes (
+    note_id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    sentence TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    audio_hash TEXT NOT NULL
+);
+CREATE TEMP TABLE IF NOT EXISTS staged_matches (
+    note_id INTEGER NOT NULL,
+    original TEXT NOT NULL,
+    PRIMARY KEY (note_id, original)
+);
+"""
+_STAGED = ("staged_seen", "staged_notes", "staged_matches")
+
+REPLACEMENT = "replacement"
+HINT = "hint"
+
+
+@dataclass(frozen=True)
+class RuleChange:
+    kind: str
+    scope: tuple[str, ...]
+    original: str
+    # None on the old side for an added entry, on the new side for a removed one.
+    old: str | None
+    new: str | None
+
+
+@dataclass(frozen=True)
+class IndexedNote:
+    note_id: int
+    source: str
+    sentence: str
+
+
+@dataclass(frozen=True)
+class NoteState:
+    """What a note looked like when it was last brought up to date."""
+
+    # hasher.fingerprint() of the fields _build reads.
+    fingerprint: str
+    # hasher.rules_digest() the note's audio hash was computed under.
+    rules: str
+    audio_hash: str
+
+
+@dataclass(frozen=True)
+class IndexEntry:
+    note_id: int
+    source: str
+    sentence: str
+    matched: set[str]
+    fingerprint: str
+    audio_hash: str
+
+
+def _flatten(
+    replacement_rules: rpl.CompiledRules, hint_rules: rpl.CompiledRules
+) -> dict[tuple[str, tuple[str, ...], str], str]:
+    flat = {}
+    for kind, rules in ((REPLACEMENT, replacement_rules), (HINT, hint_rules)):
+        for scope, original, reading in rules.entries():
+            flat[kind, scope, original] = reading
+    return flat
+
+
+class CardIndex:
+    """SQLite record of each note's sentence and Source, and the rules last run with.
+
+    Per deck it keeps every note's clean sentence and Source, the originals that
+    matched it (JSON or per-card), the fingerprint of its fields and the audio hash
+    they built to, and a snapshot of the flattened rules from the last clean run.
+    states() lets a run skip notes whose fields and rules haven't moved without
+    building them. changes() diffs that snapshot against the current rules, and
+    affected() narrows a diff to the notes whose Source falls under a changed
+    scope and whose sentence contains a changed original: removed or changed
+    entries through the matches table, added ones by a substring scan, since no
+    note can have matched them yet. Any other note would build exactly as before.
+
+    A run stage()s its notes batch by batch into temporary tables, so nothing of
+    the deck is held in memory; record() folds them in only once the run is clean.
+    """
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path)
+        # The index is derived data: on a schema change, start over.
+        if self._db.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+            with self._db:
+                for table in _TABLES:
+                    self._db.execute(f"DROP TABLE IF EXISTS {table}")
+                self._db.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+        self._db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._db.close()
+
+    def states(self, deck_name: str, note_ids: Iterable[int]) -> dict[int, NoteState]:
+        note_ids = list(note_ids)
+        states = {}
+        # Chunked to stay under SQLite's bound-parameter limit.
+        for i in range(0, len(note_ids), 500):
+            chunk = note_ids[i : i + 500]
+            rows = self._db.execute(
+                "SELECT note_id, fingerprint, rules, audio_hash FROM notes"
+                f" WHERE deck = ? AND note_id IN ({', '.join('?' * len(chunk))})",
+                (deck_name, *chunk),
+            )
+            for note_id, fingerprint, rules, audio_hash in rows:
+                states[note_id] = NoteState(fingerprint, rules, audio_hash)
+        return states
+
+    def changes(
+        self,
+        deck_name: str,
+        replacement_rules: rpl.CompiledRules,
+        hint_rules: rpl.CompiledRules,
+        settings: str,
+    ) -> list[RuleChange] | None:
+        """Rule entries that differ from the deck's snapshot.
+
+        None if there is no snapshot, or it was taken with different voice settings
+        or HASH_VERSION, which move every hash and call for a full run.
+        """
+        row = self._db.execute(
+            "SELECT settings FROM snapshots WHERE deck = ?", (deck_name,)
+        ).fetchone()
+        if row is None or row[0] != settings:
+            return None
+        old = {
+            (kind, tuple(json.loads(scope)), original): reading
+            for kind, scope, original, reading in self._db.execute(
+                "SELECT kind, scope, original, reading FROM rules WHERE deck = ?",
+                (deck_name,),
+            )
+        }
+        new = _flatten(replacement_rules, hint_rules)
+        changes = []
+        for key in sorted(old.keys() | new.keys()):
+            if old.get(key) != new.get(key):
+                kind, scope, original = key
+                changes.append(RuleChange(kind, scope, original, old.get(key), new.get(key)))
+        return changes
+
+    def affected(self, deck_name: str, changes: list[RuleChange]) -> list[IndexedNote]:
+        """Notes in the deck that the changed entries can reach, in note id order."""
+        found: dict[int, IndexedNote] = {}
+        paths: dict[str, list[tuple[str, ...]]] = {}
+        for change in changes:
+            if change.old is None:
+                rows = self._db.execute(
+                    "SELECT note_id, source, sentence FROM notes"
+                    " WHERE deck = ? AND instr(sentence, ?) > 0",
+                    (deck_name, change.original),
+                )
+            else:
+                rows = self._db.execute(
+                    "SELECT n.note_id, n.source, n.sentence FROM matches m"
+                    " JOIN notes n ON n.deck = m.deck AND n.note_id = m.note_id"
+                    " WHERE m.deck = ? AND m.original = ?",
+                    (deck_name, change.original),
+                )
+            for note_id, source, sentence in rows:
+                if source not in paths:
+                    paths[source] = rpl.scope_paths(source)
+                if change.scope in paths[source]:
+                    found[note_id] = IndexedNote(note_id, source, sentence)
+        return [found[note_id] for note_id in sorted(found)]
+
+    def stage(self, entries: Iterable[IndexEntry], seen: Iterable[int]) -> None:
+        """Hold a batch's built notes, and every note id it fetched, for record()."""
+        with self._db:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO staged_seen VALUES (?)", [(n,) for n in seen]
+            )
+            for entry in entries:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO staged_notes VALUES (?, ?, ?, ?, ?)",
+                    (
+                        entry.note_id,
+                        entry.source,
+                        entry.sentence,
+                        entry.fingerprint,
+                        entry.audio_hash,
+                    ),
+                )
+                self._db.execute(
+                    "DELETE FROM staged_matches WHERE note_id = ?", (entry.note_id,)
+                )
+                self._db.executemany(
+                    "INSERT INTO staged_matches VALUES (?, ?)",
+                    [(entry.note_id, original) for original in entry.matched],
+                )
+
+    def discard(self) -> None:
+        """Drop what was staged, e.g. after a run that left failures."""
+        with self._db:
+            for table in _STAGED:
+                self._db.execute(f"DELETE FROM {table}")
+
+    def record(
+        self,
+        deck_name: str,
+        replacement_rules: rpl.CompiledRules,
+        hint_rules: rpl.CompiledRules,
+        settings: str,
+        rules_digest: str,
+        full: bool,
+    ) -> None:
+        """Fold the staged notes into the deck's rows and snapshot the rules.
+
+        A full run drops rows for notes it didn't see, which have left the deck.
+        Rows left in place are proven unaffected by any rule change since they were
+        written (they'd have been fetched and rebuilt otherwise), so they move to
+        the current rules_digest.
+        """
+        with self._db:
+            if full:
+                for table in ("notes", "matches"):
+                    self._db.execute(
+                        f"DELETE FROM {table} WHERE deck = ?"
+                        " AND note_id NOT IN (SELECT note_id FROM staged_seen)",
+                        (deck_name,),
+                    )
+            self._db.execute(
+                "DELETE FROM matches WHERE deck = ?"
+                " AND note_id IN (SELECT note_id FROM staged_notes)",
+                (deck_name,),
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO notes SELECT ?, note_id, source, sentence,"
+                " fingerprint, ?, audio_hash FROM staged_notes",
+                (deck_name, rules_digest),
+            )
+            self._db.execute(
+                "INSERT OR IGNORE INTO matches SELECT ?, note_id, original FROM staged_matches",
+                (deck_name,),
+            )
+            self._db.execute(
+                "UPDATE notes SET rules = ? WHERE deck = ?", (rules_digest, deck_name)
+            )
+            self._db.execute("DELETE FROM rules WHERE deck = ?", (deck_name,))
+            self._db.executemany(
+                "INSERT INTO rules VALUES (?, ?, ?, ?, ?)",
+                [
+                    (deck_name, kind, json.dumps(scope, ensure_ascii=False), original, reading)
+                    for (kind, scope, original), reading in _flatten(
+                        replacement_rules, hint_rules
+                    ).items()
+                ],
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO snapshots VALUES (?, ?)", (deck_name, settings)
+            )
+            for table in _STAGED:
+                self._db.execute(f"DELETE FROM {table}")
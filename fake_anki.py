@@ -0,0 +1,416 @@
+"""A stand-in AnkiConnect server over an in-memory collection, for benchmarks and load tests.
+
+    python fake_anki.py --cards 50000 --latency 0.02 --per-item 0.0002 --error-rate 0.01
+
+Serves the actions the tool uses (findCards, findNotes, cardsInfo, notesInfo,
+storeMediaFile, updateNoteFields, getMediaFilesNames, multi, version) on
+localhost:8765 by default, so `python main.py <deck>` runs against it unchanged.
+Like the add-on, requests are handled one at a time, as if on Anki's main thread.
+"""
+import argparse
+import base64
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import processor
+
+DECK = "Mining"
+MODEL = "Japanese Mining"
+SERIES = ("INS", "ASU", "NG", "FR", "BA", "YLIA")
+VOLUMES = 12
+PAGES = 200
+
+# Sentence parts. Some subjects are originals in replacements.json/hints.json, so
+# synthetic decks exercise substitution and prompt building as real ones do.
+_SUBJECTS = (
+    "曲", "兎子", "中見", "明日小路", "明日ちゃん", "小路", "涼風", "八神", "柴関",
+    "先生", "彼女", "私", "お兄ちゃん", "店長", "みんな", "猫", "友達", "あの人",
+)
+_OBJECTS = (
+    "学校", "駅前の店", "図書館", "海", "山の上", "食彩市場", "九曜高校", "部屋",
+    "公園", "月影祭", "教室", "台所", "神社", "屋上",
+)
+_PREDICATES = (
+    "に行った", "で待っている", "を見ていた", "が好きだ", "に来たことがない",
+    "で会おうって言ってた", "の話をしてくれた", "が上出来だと思う", "に興味津々だった",
+    "で色黒の人を見た", "から帰ってきた", "を探している",
+)
+_ENDINGS = ("。", "！", "よ。", "ね。", "か？", "…", "んだ。")
+
+
+def _sentence(rng: random.Random) -> str:
+    return (
+        f"{rng.choice(_SUBJECTS)}は{rng.choice(_OBJECTS)}{rng.choice(_PREDICATES)}"
+        f"{rng.choice(_ENDINGS)}"
+    )
+
+
+def _source(rng: random.Random) -> str:
+    series = rng.choice(SERIES)
+    volume = rng.randint(1, VOLUMES)
+    page = rng.randint(1, PAGES)
+    pages = f"P{page},{page + 1}" if rng.random() < 0.1 else f"P{page}"
+    return f"{series} V{volume} {pages}"
+
+
+@dataclass
+class Note:
+    note_id: int
+    fields: dict[str, str]
+    cards: list[int]
+    mod: int
+    tags: list[str] = field(default_factory=list)
+
+
+@dataclass
+class Card:
+    card_id: int
+    note_id: int
+    deck: str
+    ord: int
+
+
+class Collection:
+    """Notes, cards and media held in memory, shaped like AnkiConnect's answers."""
+
+    def __init__(self, keep_media: bool = False):
+        self.notes: dict[int, Note] = {}
+        self.cards: dict[int, Card] = {}
+        # filename -> bytes, or just the size when keep_media is off.
+        self.media: dict[str, bytes | int] = {}
+        self.keep_media = keep_media
+
+    def add_note(self, deck: str, fields: dict[str, str], cards: int = 1, mod: int = 0) -> Note:
+        note_id = 1_500_000_000_000 + len(self.notes)
+        card_ids = []
+        for ord_ in range(cards):
+            card_id = 1_600_000_000_000 + len(self.cards)
+            self.cards[card_id] = Card(card_id, note_id, deck, ord_)
+            card_ids.append(card_id)
+        note = Note(note_id, dict(fields), card_ids, mod or int(time.time()))
+        self.notes[note_id] = note
+        return note
+
+    def find_cards(self, query: str) -> list[int]:
+        decks, since = _parse_query(query)
+        return [
+            card.card_id
+            for card in self.cards.values()
+            if (decks is None or card.deck in decks)
+            and (since is None or self.notes[card.note_id].mod >= since)
+        ]
+
+    def find_notes(self, query: str) -> list[int]:
+        return sorted({self.cards[card_id].note_id for card_id in self.find_cards(query)})
+
+    def card_info(self, card_id: int) -> dict:
+        card = self.cards.get(card_id)
+        if card is None:
+            return {}
+        note = self.notes[card.note_id]
+        expression = note.fields.get(processor.SENTENCE_FIELD, "")
+        return {
+            "cardId": card.card_id,
+            "note": note.note_id,
+            "deckName": card.deck,
+            "modelName": MODEL,
+            "fieldOrder": card.ord,
+            "fields": _fields(note),
+            "question": f"<div class=front>{expression}</div>",
+            "answer": f"<div class=front>{expression}</div><hr id=answer>"
+            f"{note.fields.get(processor.AUDIO_FIELD, '')}",
+            "css": ".card { font-family: sans-serif; font-size: 24px; }",
+            "ord": card.ord,
+            "type": 2,
+            "queue": 2,
+            "due": 1000,
+            "interval": 10,
+            "factor": 2500,
+            "reps": 5,
+            "lapses": 0,
+            "left": 0,
+            "mod": note.mod,
+        }
+
+    def note_info(self, note_id: int) -> dict:
+        note = self.notes.get(note_id)
+        if note is None:
+            return {}
+        return {
+            "noteId": note.note_id,
+            "modelName": MODEL,
+            "tags": note.tags,
+            "fields": _fields(note),
+            "cards": note.cards,
+            "mod": note.mod,
+        }
+
+    def update_note_fields(self, note: dict) -> None:
+        target = self.notes.get(note["id"])
+        if target is None:
+            raise ValueError("note was not found")
+        target.fields.update(note["fields"])
+        target.mod = int(time.time())
+
+    def store_media_file(self, filename: str, data: str) -> str:
+        raw = base64.b64decode(data)
+        self.media[filename] = raw if self.keep_media else len(raw)
+        return filename
+
+    def media_file_names(self, pattern: str = "*") -> list[str]:
+        prefix, _, suffix = pattern.partition("*")
+        return [n for n in self.media if n.startswith(prefix) and n.endswith(suffix)]
+
+
+def _parse_query(query: str) -> tuple[set[str] | None, float | None]:
+    """The decks and the edited-since time in the deck:"…" and edited:N terms the tool sends."""
+    decks, since = None, None
+    for term in _terms(query):
+        key, _, value = term.partition(":")
+        if key == "deck":
+            decks = (decks or set()) | {value.strip('"')}
+        elif key == "edited":
+            since = time.time() - int(value) * 86400
+    return decks, since
+
+
+def _terms(query: str) -> list[str]:
+    """Split a search on spaces outside double quotes."""
+    terms, current, quoted = [], "", False
+    for ch in query:
+        if ch == '"':
+            quoted = not quoted
+        if ch == " " and not quoted:
+            if current:
+                terms.append(current)
+            current = ""
+        else:
+            current += ch
+    if current:
+        terms.append(current)
+    return terms
+
+
+def _fields(note: Note) -> dict:
+    return {
+        name: {"value": value, "order": i} for i, (name, value) in enumerate(note.fields.items())
+    }
+
+
+def synthetic_deck(
+    cards: int,
+    deck: str = DECK,
+    seed: int = 0,
+    duplicate_rate: float = 0.05,
+    regenerate_rate: float = 0.0,
+    cards_per_note: int = 1,
+    collection: Collection | None = None,
+) -> Collection:
+    """A collection with `cards` cards of synthetic Japanese sentence notes.
+
+    Every note has Expression, Source, an empty AI Audio and the optional fields.
+    duplicate_rate of the notes repeat an earlier sentence and Source, so they hash
+    alike; regenerate_rate have Regenerate Audio set. The same seed gives the same deck.
+    """
+    rng = random.Random(seed)
+    collection = collection or Collection()
+    # Last edited a month ago, so edited:N searches only see what a run touches.
+    mod = int(time.time()) - 30 * 86400
+    notes: list[tuple[str, str]] = []
+    for _ in range(max(1, cards // cards_per_note)):
+        if notes and rng.random() < duplicate_rate:
+            sentence, source = rng.choice(notes)
+        else:
+            sentence, source = _sentence(rng), _source(rng)
+            notes.append((sentence, source))
+        collection.add_note(
+            deck,
+            {
+                processor.SENTENCE_FIELD: sentence,
+                processor.AUDIO_FIELD: "",
+                processor.SOURCE_FIELD: source,
+                processor.REGENERATE_FIELD: "1" if rng.random() < regenerate_rate else "",
+                processor.CARD_REPLACEMENTS_FIELD: "",
+                processor.CARD_HINTS_FIELD: "",
+            },
+            cards=cards_per_note,
+            mod=mod,
+        )
+    return collection
+
+
+@dataclass
+class Behavior:
+    """Server-side cost and failure injection.
+
+    Each request takes latency seconds plus per_item for every id, file or action
+    it carries, with up to jitter extra, all while holding the collection lock.
+    error_rate answers an AnkiConnect error instead of a result (per action inside
+    multi), and http_error_rate a 503, which AnkiClient treats as retryable.
+    """
+
+    latency: float = 0.0
+    per_item: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    http_error_rate: float = 0.0
+    seed: int = 0
+
+
+class FakeAnkiConnect:
+    """Dispatches AnkiConnect requests against a Collection."""
+
+    def __init__(self, collection: Collection, behavior: Behavior | None = None):
+        self.collection = collection
+        self.behavior = behavior or Behavior()
+        self.requests: dict[str, int] = {}
+        self._rng = random.Random(self.behavior.seed)
+        self._lock = threading.Lock()
+
+    def handle(self, body: dict) -> tuple[int, dict]:
+        """(HTTP status, response body) for one request."""
+        action, params = body.get("action"), body.get("params") or {}
+        with self._lock:
+            self.requests[action] = self.requests.get(action, 0) + 1
+            b = self.behavior
+            time.sleep(b.latency + b.per_item * _items(params) + self._rng.random() * b.jitter)
+            if self._rng.random() < b.http_error_rate:
+                return 503, {"result": None, "error": "injected HTTP error"}
+            if action == "multi":
+                return 200, {"result": [self._one(a) for a in params["actions"]], "error": None}
+            return 200, self._one(body)
+
+    def _one(self, body: dict) -> dict:
+        if self._rng.random() < self.behavior.error_rate:
+            return {"result": None, "error": "injected error"}
+        try:
+            return {"result": self._dispatch(body["action"], body.get("params") or {}), "error": None}
+        except (KeyError, ValueError) as e:
+            return {"result": None, "error": str(e)}
+
+    def _dispatch(self, action: str, params: dict):
+        c = self.collection
+        if action == "version":
+            return 6
+        if action == "findCards":
+            return c.find_cards(params["query"])
+        if action == "findNotes":
+            return c.find_notes(params["query"])
+        if action == "cardsInfo":
+            return [c.card_info(card_id) for card_id in params["cards"]]
+        if action == "notesInfo":
+            return [c.note_info(note_id) for note_id in params["notes"]]
+        if action == "updateNoteFields":
+            return c.update_note_fields(params["note"])
+        if action == "storeMediaFile":
+            return c.store_media_file(params["filename"], params["data"])
+        if action == "getMediaFilesNames":
+            return c.media_file_names(params.get("pattern", "*"))
+        raise ValueError(f"unsupported action {action}")
+
+
+def _items(params: dict) -> int:
+    for key in ("cards", "notes", "actions"):
+        if key in params:
+            return len(params[key])
+    return 1
+
+
+class FakeAnkiServer:
+    """FakeAnkiConnect over HTTP on a background thread; port 0 picks a free one."""
+
+    def __init__(self, anki: FakeAnkiConnect, host: str = "127.0.0.1", port: int = 0):
+        self.anki = anki
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                status, response = anki.handle(body)
+                data = json.dumps(response, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeAnkiServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def serve_forever(self) -> None:
+        """Serve on the calling thread instead, until interrupted."""
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+
+    def __enter__(self) -> "FakeAnkiServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def serve(
+    port: int,
+    cards: int,
+    behavior: Behavior | None = None,
+    seed: int = 0,
+    deck: str = DECK,
+    host: str = "127.0.0.1",
+) -> None:
+    """Serve a synthetic deck until interrupted; a target for multiprocessing too."""
+    anki = FakeAnkiConnect(synthetic_deck(cards, deck=deck, seed=seed), behavior)
+    FakeAnkiServer(anki, host, port).serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--cards", type=int, default=10_000)
+    parser.add_argument("--deck", default=DECK)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per request")
+    parser.add_argument("--per-item", type=float, default=0.0, help="Seconds per id or action")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Up to this many extra seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--http-error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    behavior = Behavior(
+        latency=args.latency,
+        per_item=args.per_item,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        http_error_rate=args.http_error_rate,
+        seed=args.seed,
+    )
+    print(f"Serving {args.cards} cards in {args.deck!r} on http://127.0.0.1:{args.port}")
+    serve(args.port, args.cards, behavior, seed=args.seed, deck=args.deck)
+
+
+if __name__ == "__main__":
+    main()
@@ -26,3 +26,37 @@ def compute(
     }
     raw = json.dumps(data, sort_keys=True, ensure_ascii=False)
     return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def _settings() -> dict:
+    return {
+        "version": HASH_VERSION,
+        "speaker": SPEAKER,
+        "provider": PROVIDER,
+        "bitrate": BITRATE,
+        "speed": SPEED,
+    }
+
+
+def _digest(data: dict) -> str:
+    raw = json.dumps(data, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def settings_digest() -> str:
+    """Digest of the inputs every card's hash shares: HASH_VERSION and the voice settings."""
+    return _digest(_settings())
+
+
+def rules_digest(replacements_data: dict, hints_data: dict) -> str:
+    """Digest of every input that can move a card's hash besides its own fields."""
+    return _digest({**_settings(), "replacements": replacements_data, "hints": hints_data})
+
+
+def fingerprint(*values: str) -> str:
+    """Cheap digest of raw field values, to tell whether a note changed since last seen."""
+    h = hashlib.blake2b(digest_size=8)
+    for value in values:
+        h.update(value.encode("utf-8"))
+        h.update(b"\x1f")
+    return h.hexdigest()
@@ -0,0 +1,148 @@
+import json
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Events, in the order a job normally goes through them.
+JOB = "job"
+SYNTHESIZED = "synthesized"
+STORED = "stored"
+LINKED = "linked"
+
+
+@dataclass
+class PendingJob:
+    audio_hash: str
+    audio_filename: str
+    spoken_text: str
+    prompt: str
+    notes: dict[int, bool]
+    synthesized: bool = False
+    stored: bool = False
+    linked: set[int] = field(default_factory=set)
+
+
+@dataclass
+class PendingRun:
+    deck_name: str
+    started: str
+    jobs: list[PendingJob]
+    # False if the run was cut short before it had read the whole deck.
+    complete: bool
+
+
+class RunJournal:
+    """Append-only JSONL record of a run's plan and each job's progress.
+
+    start() truncates the file and writes the run header; plan() then adds a `job`
+    line as each job is created, and again for notes that join it later: everything
+    needed to finish it without re-fetching the deck. Jobs are planned as the deck
+    streams in, so `planned` marks the point where the whole deck had been read. Progress
+    events (`synthesized`, `stored`, `linked`) are appended and flushed one line at a
+    time as they happen, and `done` marks a run that left nothing behind. load()
+    replays the file; a missing `done` means the run was interrupted or left failures,
+    and the result says exactly which steps are still outstanding. A torn last line
+    from a kill mid-write is ignored.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = None
+
+    def start(self, deck_name: str) -> None:
+        self.close()
+        self._file = open(self.path, "w", encoding="utf-8")
+        self._write({
+            "event": "run",
+            "deck": deck_name,
+            "started": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        })
+
+    def plan(self, job, notes: dict[int, bool]) -> None:
+        """Record that the job will link these notes; lines for one hash accumulate."""
+        if self._file is None:
+            return
+        self._write({
+            "event": JOB,
+            "hash": job.audio_hash,
+            "filename": job.audio_filename,
+            "text": job.spoken_text,
+            "prompt": job.prompt,
+            "notes": [[note_id, clear] for note_id, clear in notes.items()],
+        })
+
+    def planned(self) -> None:
+        """Record that every job of the run has been planned."""
+        if self._file is not None:
+            self._write({"event": "planned"})
+
+    def reopen(self) -> None:
+        """Continue appending to an existing journal (for a resumed run)."""
+        self.close()
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def record(self, event: str, audio_hash: str, note_id: int | None = None) -> None:
+        if self._file is None:
+            return
+        entry: dict = {"event": event, "hash": audio_hash}
+        if note_id is not None:
+            entry["note"] = note_id
+        self._write(entry)
+
+    def finish(self) -> None:
+        if self._file is not None:
+            self._write({"event": "done"})
+        self.close()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def load(self) -> PendingRun | None:
+        """The unfinished run in the journal, or None if there isn't one."""
+        if not self.path.exists():
+            return None
+        run: dict | None = None
+        complete = False
+        jobs: dict[str, PendingJob] = {}
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                event = entry.get("event")
+                if event == "run":
+                    run = entry
+                elif event == "done":
+                    return None
+                elif event == "planned":
+                    complete = True
+                elif event == JOB:
+                    job = jobs.get(entry["hash"])
+                    if job is None:
+                        job = jobs[entry["hash"]] = PendingJob(
+                            audio_hash=entry["hash"],
+                            audio_filename=entry["filename"],
+                            spoken_text=entry["text"],
+                            prompt=entry["prompt"],
+                            notes={},
+                        )
+                    for note_id, clear in entry["notes"]:
+                        job.notes[note_id] = job.notes.get(note_id, False) or clear
+                elif entry.get("hash") in jobs:
+                    job = jobs[entry["hash"]]
+                    if event == SYNTHESIZED:
+                        job.synthesized = True
+                    elif event == STORED:
+                        job.stored = True
+                    elif event == LINKED:
+                        job.linked.add(entry["note"])
+        if run is None:
+            return None
+        return PendingRun(run["deck"], run["started"], list(jobs.values()), complete)
+
+    def _write(self, entry: dict) -> None:
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
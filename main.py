@@ -1,5 +1,6 @@
 import argparse
 import json
+import os
 import sys
 from pathlib import Path
 
@@ -11,23 +12,154 @@ def main() -> None:
     parser = argparse.ArgumentParser(
         description="Generate TTS audio for Anki cards and store them via AnkiConnect."
     )
-    parser.add_argument("deck_name", help="Name of the Anki deck to process")
+    parser.add_argument("deck_name", nargs="?", help="Name of the Anki deck to process")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Finish the last interrupted run from its journal instead of fetching a deck",
+    )
     parser.add_argument(
         "--dry-run",
         action="store_true",
         help="Show which cards need audio without calling the TTS API",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Number of TTS calls to run concurrently (default: 1)",
+    )
+    parser.add_argument(
+        "--async",
+        dest="async_requests",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Drive TTS calls from one asyncio thread with N in flight (replaces --workers)",
+    )
+    parser.add_argument(
+        "--rpm",
+        type=float,
+        metavar="N",
+        help="Cap TTS requests per minute",
+    )
+    parser.add_argument(
+        "--cpm",
+        type=float,
+        metavar="N",
+        help="Cap characters sent to the TTS API per minute",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=4,
+        metavar="N",
+        help="Attempts per TTS or AnkiConnect call on transient errors (default: 4)",
+    )
+    parser.add_argument(
+        "--retry-budget",
+        type=int,
+        default=200,
+        metavar="N",
+        help="Total retries allowed per run before failing fast (default: 200)",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only check notes edited since the last clean run, unless the rules changed",
+    )
+    parser.add_argument(
+        "--by-note",
+        action="store_true",
+        help="Fetch one record per note with findNotes/notesInfo instead of per-card cardsInfo",
+    )
+    parser.add_argument(
+        "--anki-pool",
+        type=int,
+        default=4,
+        metavar="N",
+        help="Keep-alive connections to AnkiConnect (default: 4)",
+    )
+    parser.add_argument(
+        "--anki-timeout",
+        type=float,
+        default=120.0,
+        metavar="SECONDS",
+        help="Read timeout for each AnkiConnect request (default: 120)",
+    )
+    parser.add_argument(
+        "--fetch-window",
+        type=int,
+        default=2,
+        metavar="N",
+        help="cardsInfo/notesInfo batches to keep in flight at once (default: 2)",
+    )
+    parser.add_argument(
+        "--fetch-batch",
+        type=int,
+        metavar="N",
+        help="Fetch N records per batch instead of sizing batches from response times",
+    )
+    parser.add_argument(
+        "--write-batch",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Buffer up to N AnkiConnect writes per multi request (default: 1)",
+    )
+    parser.add_argument(
+        "--write-interval",
+        type=float,
+        default=5.0,
+        metavar="SECONDS",
+        help="Flush buffered writes at least this often (default: 5)",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=1024,
+        metavar="MB",
+        help="Evict least recently used files from audio_output/ beyond this size (default: 1024)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Ignore audio_output/ files from earlier runs and call the TTS API instead",
+    )
+    parser.add_argument(
+        "--encoders",
+        type=int,
+        default=os.cpu_count() or 1,
+        metavar="N",
+        help="Encode MP3s in N worker processes, off the network threads "
+        "(default: one per core; 0 encodes inline)",
+    )
     args = parser.parse_args()
+    if args.deck_name is None and not args.resume:
+        parser.error("the following arguments are required: deck_name")
 
     import replacements as rpl
     from anki import AnkiClient
+    from audio.encode import EncoderPool
     from audio.gemini import GeminiAudioGenerator
     from processor import Processor
+    from retry import RetryPolicy
 
     replacements_data = rpl.load(REPLACEMENTS_FILE)
     hints_data = rpl.load(HINTS_FILE) if HINTS_FILE.exists() else {}
-    anki = AnkiClient()
-    generator = GeminiAudioGenerator()
+    retry = RetryPolicy(max_attempts=args.retries, budget=args.retry_budget)
+    anki = AnkiClient(
+        pool_size=args.anki_pool,
+        timeout=(3.0, args.anki_timeout),
+        retry=retry,
+        fetch_window=args.fetch_window,
+        batch_size=args.fetch_batch,
+    )
+    # The pool starts its workers on the first encode, so dry runs and runs with
+    # nothing to synthesize never spawn them.
+    encoder = EncoderPool(args.encoders) if args.encoders > 0 else None
+    generator = GeminiAudioGenerator(encoder=encoder)
 
     processor = Processor(
         anki=anki,
@@ -35,8 +167,28 @@ def main() -> None:
         replacements_data=replacements_data,
         hints_data=hints_data,
         dry_run=args.dry_run,
+        workers=args.workers,
+        async_requests=args.async_requests,
+        requests_per_minute=args.rpm,
+        chars_per_minute=args.cpm,
+        retry=retry,
+        by_note=args.by_note,
+        incremental=args.incremental,
+        write_batch=args.write_batch,
+        write_interval=args.write_interval,
+        cache_size=args.cache_size * 1024 * 1024,
+        use_cache=not args.no_cache,
     )
-    processor.run(args.deck_name)
+    try:
+        if args.resume:
+            processor.resume()
+        else:
+            processor.run(args.deck_name)
+    finally:
+        processor.close()
+        anki.close()
+        if encoder is not None:
+            encoder.close()
 
 
 if __name__ == "__main__":
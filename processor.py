@@ -1,11 +1,27 @@
+import asyncio
+import functools
+import math
 import re
-from dataclasses import dataclass
+import threading
+import time
+from collections import Counter, deque
+from collections.abc import Awaitable, Callable, Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
+from datetime import datetime
 from pathlib import Path
 
 import replacements as rpl
 import hasher
-from anki import AnkiClient
-from audio.base import AudioGenerator
+import journal
+from anki import FLUSH_INTERVAL, FLUSH_SIZE, AnkiClient, BatchWriter
+from audio.base import AudioGenerator, PcmAudioGenerator
+from cache import AudioCache
+from card_index import CardIndex, IndexEntry, NoteState
+from ratelimit import RateLimiter
+from retry import RetryPolicy
+from state import RunState
 
 SENTENCE_FIELD = "Expression"
 AUDIO_FIELD = "AI Audio"
@@ -14,6 +30,15 @@ REGENERATE_FIELD = "Regenerate Audio"
 CARD_REPLACEMENTS_FIELD = "Replacements"
 CARD_HINTS_FIELD = "Reading Hints"
 OUTPUT_DIR = Path(__file__).parent / "audio_output"
+JOURNAL_FILE = "journal.jsonl"
+STATE_FILE = "state.json"
+INDEX_FILE = "card_index.sqlite3"
+CACHE_SIZE = 1024 * 1024 * 1024
+
+# Where a job's audio came from.
+SYNTHESIZED = "synthesized"
+CACHED = "cached"
+IN_ANKI = "in_anki"
 
 _HTML_TAG_RE = re.compile(r"<[^>]+>")
 
@@ -26,11 +51,23 @@ def _field(card: dict, name: str) -> str:
     return card.get("fields", {}).get(name, {}).get("value", "")
 
 
+def _ids(record: dict) -> tuple[int, int]:
+    """Return (note_id, card_id) for a cardsInfo or a notesInfo record.
+
+    A notesInfo record stands in for all of its cards; the first one is reported.
+    """
+    if "noteId" in record:
+        cards = record.get("cards") or [0]
+        return record["noteId"], cards[0]
+    return record["note"], record["cardId"]
+
+
 @dataclass
 class ProcessableCard:
     note_id: int
     card_id: int
     clean_sentence: str
+    source: str
     applicable_replacements: list[tuple[str, str]]
     applicable_hints: list[tuple[str, str]]
     spoken_text: str
@@ -54,9 +91,9 @@ def _resolve(
 
 
 def _build(
-    card: dict, replacements_data: dict, hints_data: dict
+    card: dict, replacement_rules: rpl.CompiledRules, hint_rules: rpl.CompiledRules
 ) -> ProcessableCard | None:
-    """Build a ProcessableCard from a raw AnkiConnect card dict.
+    """Build a ProcessableCard from a raw AnkiConnect cardsInfo or notesInfo dict.
 
     Returns None if the sentence is empty.
     """
@@ -69,7 +106,7 @@ def _build(
 
     # Hard replacements: substitute the reading into the spoken text (kanji removed).
     replacements = _resolve(
-        rpl.get_applicable(replacements_data, clean_sentence, source_value),
+        replacement_rules.applicable(clean_sentence, source_value),
         _field(card, CARD_REPLACEMENTS_FIELD),
     )
     spoken_text = rpl.apply_readings(clean_sentence, replacements)
@@ -79,7 +116,7 @@ def _build(
     hints = [
         (original, reading)
         for original, reading in _resolve(
-            rpl.get_applicable(hints_data, clean_sentence, source_value),
+            hint_rules.applicable(clean_sentence, source_value),
             _field(card, CARD_HINTS_FIELD),
         )
         if original in spoken_text
@@ -90,11 +127,13 @@ def _build(
     audio_filename = f"speech_{audio_hash}.mp3"
     current_audio_value = _field(card, AUDIO_FIELD)
     force_regenerate = bool(_field(card, REGENERATE_FIELD).strip())
+    note_id, card_id = _ids(card)
 
     return ProcessableCard(
-        note_id=card["note"],
-        card_id=card["cardId"],
+        note_id=note_id,
+        card_id=card_id,
         clean_sentence=clean_sentence,
+        source=source_value,
         applicable_replacements=replacements,
         applicable_hints=hints,
         spoken_text=spoken_text,
@@ -110,6 +149,193 @@ def _needs_generation(card: ProcessableCard) -> bool:
     return card.force_regenerate or card.audio_hash not in card.current_audio_value
 
 
+def _matched(card: ProcessableCard) -> set[str]:
+    return {original for original, _ in card.applicable_replacements + card.applicable_hints}
+
+
+def _fingerprint(card: dict) -> str:
+    """Fingerprint of every field _build reads to compute the audio hash."""
+    return hasher.fingerprint(
+        _field(card, SENTENCE_FIELD),
+        _field(card, SOURCE_FIELD),
+        _field(card, CARD_REPLACEMENTS_FIELD),
+        _field(card, CARD_HINTS_FIELD),
+    )
+
+
+def _unchanged(card: dict, state: NoteState | None, fingerprint: str, trusted: set[str]) -> bool:
+    """Whether the index proves the card current without building it.
+
+    Its fields must fingerprint the same as when its audio was last settled, under
+    rules its row is trusted for, and its AI Audio must still point at that audio.
+    """
+    return (
+        state is not None
+        and state.fingerprint == fingerprint
+        and state.rules in trusted
+        and state.audio_hash in _field(card, AUDIO_FIELD)
+        and not _field(card, REGENERATE_FIELD).strip()
+    )
+
+
+@dataclass
+class AudioJob:
+    """One TTS synthesis, shared by every card that hashes to the same audio."""
+
+    audio_hash: str
+    audio_filename: str
+    spoken_text: str
+    prompt: str
+    # Each distinct note id -> whether its Regenerate Audio field needs clearing.
+    notes: dict[int, bool] = field(default_factory=dict)
+    # Set once its write-back is queued; notes can no longer join it after that.
+    written: bool = field(default=False, compare=False)
+
+    @classmethod
+    def for_card(cls, pc: ProcessableCard) -> "AudioJob":
+        job = cls(
+            audio_hash=pc.audio_hash,
+            audio_filename=pc.audio_filename,
+            spoken_text=pc.spoken_text,
+            prompt=pc.prompt,
+        )
+        job.add(pc)
+        return job
+
+    @property
+    def force_regenerate(self) -> bool:
+        return any(self.notes.values())
+
+    def add(self, pc: ProcessableCard) -> None:
+        self.notes[pc.note_id] = self.notes.get(pc.note_id, False) or pc.force_regenerate
+
+
+class _Grouper:
+    """Groups cards into AudioJobs by audio_hash as they stream in, batch by batch.
+
+    The hash covers everything that reaches the TTS API, so cards sharing one also
+    share spoken_text and prompt, and a single synthesis serves the whole group. A
+    card joins the job for its hash until that job's write-back is queued, since
+    the notes are only read then. The exception is a Regenerate Audio card meeting
+    a job from an earlier batch that was dispatched without the flag, whose audio
+    may have been reused rather than synthesized. In both cases the card starts a
+    new job for the hash, which _reuse() usually serves from Anki's media or the
+    local cache.
+    """
+
+    def __init__(self):
+        self._jobs: dict[str, AudioJob] = {}
+        self._pending: dict[str, AudioJob] = {}
+
+    def add(self, pc: ProcessableCard) -> AudioJob:
+        job = self._jobs.get(pc.audio_hash)
+        if job is not None and not job.written and (
+            self.is_pending(job) or job.force_regenerate or not pc.force_regenerate
+        ):
+            job.add(pc)
+            return job
+        job = AudioJob.for_card(pc)
+        self._jobs[pc.audio_hash] = self._pending[pc.audio_hash] = job
+        return job
+
+    def is_pending(self, job: AudioJob) -> bool:
+        """Whether the job was created in the current batch and not yet handed out."""
+        return self._pending.get(job.audio_hash) is job
+
+    def seal(self) -> list[AudioJob]:
+        """End the batch: return its new jobs, in the order their hashes first appeared."""
+        jobs = list(self._pending.values())
+        self._pending = {}
+        self._jobs = {h: job for h, job in self._jobs.items() if not job.written}
+        return jobs
+
+
+@dataclass
+class _Tally:
+    """Counts for the cards streamed so far; final once done is set."""
+
+    cards: int = 0
+    skipped_empty: int = 0
+    unchanged: int = 0
+    up_to_date: int = 0
+    to_generate: int = 0
+    jobs: int = 0
+    # Distinct audio hashes among the jobs; a hash can take more than one job when
+    # cards for it arrive after its first job was written back.
+    hashes: set[str] = field(default_factory=set)
+    done: bool = False
+
+    @property
+    def saved(self) -> int:
+        return self.to_generate - len(self.hashes)
+
+    def total(self) -> int | None:
+        return self.jobs if self.done else None
+
+
+def _settle(
+    job: AudioJob, item: tuple[bytes | None, str] | Future, writer: BatchWriter | None
+) -> tuple[AudioJob, bytes | None | Exception, str]:
+    if isinstance(item, Future):
+        return job, _wait(_result(item, writer), writer), SYNTHESIZED
+    return job, *item
+
+
+def _wait(
+    result: bytes | Future | Exception, writer: BatchWriter | None = None
+) -> bytes | Exception:
+    """Resolve an encode Future from Processor._generate into MP3 bytes or its error."""
+    if not isinstance(result, Future):
+        return result
+    try:
+        return _result(result, writer)
+    except Exception as e:
+        return e
+
+
+def _result(future: Future, writer: BatchWriter | None) -> bytes | Future | Exception:
+    """future.result(), flushing the writer each time its interval comes due meanwhile.
+
+    Writes are only queued on the main thread, so while it waits here nothing else
+    would send a buffer that has been sitting for write_interval seconds.
+    """
+    while writer is not None:
+        try:
+            return future.result(timeout=writer.due_in())
+        except FutureTimeoutError:
+            writer.flush_if_due()
+    return future.result()
+
+
+class _EventLoopThread:
+    """An asyncio event loop on a background thread, driven like an Executor.
+
+    submit() schedules a coroutine function on the loop and returns a
+    concurrent.futures.Future, so the main thread can wait on results exactly as it
+    does for a thread pool. On exit, on_close() runs on the loop before it stops.
+    """
+
+    def __init__(self, on_close: Callable[[], Awaitable[None]]):
+        self._on_close = on_close
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+
+    def __enter__(self) -> "_EventLoopThread":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        try:
+            asyncio.run_coroutine_threadsafe(self._on_close(), self._loop).result()
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+
+    def submit(self, fn: Callable[..., Awaitable], *args) -> Future:
+        return asyncio.run_coroutine_threadsafe(fn(*args), self._loop)
+
+
 class Processor:
     def __init__(
         self,
@@ -118,68 +344,522 @@ class Processor:
         replacements_data: dict,
         hints_data: dict,
         dry_run: bool = False,
+        workers: int = 1,
+        by_note: bool = False,
+        write_batch: int = FLUSH_SIZE,
+        write_interval: float = FLUSH_INTERVAL,
+        cache_size: int = CACHE_SIZE,
+        use_cache: bool = True,
+        async_requests: int = 0,
+        requests_per_minute: float | None = None,
+        chars_per_minute: float | None = None,
+        retry: RetryPolicy | None = None,
+        incremental: bool = False,
+        output_dir: Path = OUTPUT_DIR,
     ):
         self.anki = anki
         self.generator = generator
-        self.replacements_data = replacements_data
-        self.hints_data = hints_data
+        self.replacement_rules = rpl.CompiledRules(replacements_data)
+        self.hint_rules = rpl.CompiledRules(hints_data)
         self.dry_run = dry_run
-        OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+        self.workers = max(1, workers)
+        self.async_requests = max(0, async_requests)
+        self.limiter = RateLimiter(
+            requests_per_minute,
+            chars_per_minute,
+            max_concurrency=self.async_requests or self.workers,
+        )
+        self.by_note = by_note
+        self.write_batch = write_batch
+        self.write_interval = write_interval
+        self.output_dir = output_dir
+        self.cache = AudioCache(output_dir, cache_size)
+        self.use_cache = use_cache
+        self.anki_media: set[str] = set()
+        self.retry = retry or RetryPolicy()
+        self._failed: dict[str, AudioJob] = {}
+        self._fresh: set[str] = set()
+        self.journal = journal.RunJournal(output_dir / JOURNAL_FILE)
+        self.incremental = incremental
+        self.state = RunState(output_dir / STATE_FILE)
+        self.index = CardIndex(output_dir / INDEX_FILE)
+
+    def close(self) -> None:
+        """Close the journal and the card index's database connection."""
+        self.journal.close()
+        self.index.close()
 
     def run(self, deck_name: str) -> None:
-        print(f"Fetching cards from deck: {deck_name}")
-        card_ids = self.anki.find_cards(deck_name)
-        print(f"Found {len(card_ids)} cards. Loading card info...")
-        raw_cards = self.anki.cards_info(card_ids)
-
-        processable = []
-        skipped_empty = 0
-        for raw in raw_cards:
-            pc = _build(raw, self.replacements_data, self.hints_data)
-            if pc is None:
-                skipped_empty += 1
-            else:
-                processable.append(pc)
-
-        if skipped_empty:
-            print(f"Skipped {skipped_empty} cards with empty sentences.")
-
-        to_generate = [
-            pc for pc in processable
-            if _needs_generation(pc)
-        ]
-        to_skip = len(processable) - len(to_generate)
-
-        print(f"{to_skip} cards already up-to-date, {len(to_generate)} need audio generation.")
+        started = time.time()
+        rules_digest = hasher.rules_digest(self.replacement_rules.data, self.hint_rules.data)
+        since, affected, trusted = self._plan(deck_name, rules_digest)
+        if self.incremental:
+            batches = self._fetch(deck_name, since, affected)
+        else:
+            since = None
+            batches = self._fetch(deck_name, None, [])
+
+        self.index.discard()
+        tally = _Tally()
+        jobs = self._jobs(deck_name, batches, set(affected), trusted, rules_digest, tally)
 
         if self.dry_run:
-            for pc in to_generate:
-                print(f"  [dry-run] {pc.audio_filename}  {pc.spoken_text[:60]}")
+            for job in jobs:
+                print(f"  [dry-run] {job.audio_filename}  {job.spoken_text[:60]}")
+            self.index.discard()
             return
 
-        for i, pc in enumerate(to_generate, 1):
-            prefix = f"[{i}/{len(to_generate)}]"
-            print(f"{prefix} {pc.spoken_text[:60]}")
-            try:
-                mp3_bytes = self.generator.generate(pc.spoken_text, pc.prompt)
-            except Exception as e:
-                print(f"  ERROR generating audio: {e}")
+        self.journal.start(deck_name)
+        sources = self._execute(jobs, tally.total)
+        # Recorded after every clean run, incremental or not, so --incremental picks up
+        # from here. Notes edited while this run was going are after `started`.
+        if self._failed:
+            self.index.discard()
+        else:
+            self.state.mark(deck_name, rules_digest, started)
+            self.index.record(
+                deck_name,
+                self.replacement_rules,
+                self.hint_rules,
+                hasher.settings_digest(),
+                rules_digest,
+                full=since is None,
+            )
+        self._report(sources, tally.saved)
+
+    def _jobs(
+        self,
+        deck_name: str,
+        batches: Iterator[list[dict]],
+        affected: set[int],
+        trusted: set[str],
+        rules_digest: str,
+        tally: _Tally,
+    ) -> Iterator[AudioJob]:
+        """Build each fetched batch and yield its new jobs before fetching the next.
+
+        Only one batch of raw records and ProcessableCards is alive at a time: built
+        notes go to the card index's staging tables, and cards that join a job from
+        an earlier batch are journaled as they arrive. The counts are printed once
+        the last batch is in.
+        """
+        grouper = _Grouper()
+        for batch in batches:
+            note_ids = {_ids(raw)[0] for raw in batch}
+            states = self.index.states(deck_name, note_ids)
+            entries = []
+            for raw in batch:
+                tally.cards += 1
+                note_id, _ = _ids(raw)
+                fingerprint = _fingerprint(raw)
+                row_trusted = {rules_digest} if note_id in affected else trusted
+                if _unchanged(raw, states.get(note_id), fingerprint, row_trusted):
+                    tally.unchanged += 1
+                    continue
+                pc = _build(raw, self.replacement_rules, self.hint_rules)
+                if pc is None:
+                    tally.skipped_empty += 1
+                    continue
+                entries.append(IndexEntry(
+                    note_id=pc.note_id,
+                    source=pc.source,
+                    sentence=pc.clean_sentence,
+                    matched=_matched(pc),
+                    fingerprint=fingerprint,
+                    audio_hash=pc.audio_hash,
+                ))
+                if not _needs_generation(pc):
+                    tally.up_to_date += 1
+                    continue
+                tally.to_generate += 1
+                job = grouper.add(pc)
+                if not grouper.is_pending(job):
+                    self.journal.plan(job, {pc.note_id: job.notes[pc.note_id]})
+            self.index.stage(entries, note_ids)
+            for job in grouper.seal():
+                tally.jobs += 1
+                tally.hashes.add(job.audio_hash)
+                self.journal.plan(job, job.notes)
+                yield job
+        tally.done = True
+        self.journal.planned()
+
+        if tally.skipped_empty:
+            print(f"Skipped {tally.skipped_empty} cards with empty sentences.")
+        to_skip = tally.up_to_date + tally.unchanged
+        print(f"{to_skip} cards already up-to-date, {tally.to_generate} need audio generation.")
+        if tally.unchanged:
+            print(f"{tally.unchanged} of them unchanged since the last run, skipped without rebuilding.")
+        if tally.saved:
+            print(f"{len(tally.hashes)} distinct audio files; {tally.saved} duplicate cards share one.")
+
+    def _plan(
+        self, deck_name: str, rules_digest: str
+    ) -> tuple[float | None, list[int], set[str]]:
+        """(since, affected note ids, trusted rules digests) from the last clean run.
+
+        since is that run's start time, or None if the whole deck needs checking.
+        When only replacements.json/hints.json changed since then, the card index
+        narrows the change to the notes it can reach: an incremental run fetches
+        them on top of the ones edited since, and every other note's index row,
+        written under the old rules, is still trusted to skip it.
+        """
+        last = self.state.last(deck_name)
+        if last is None:
+            if self.incremental:
+                print("No clean run on record; checking the whole deck.")
+            return None, [], {rules_digest}
+        since, last_digest = last
+        if last_digest == rules_digest:
+            return since, [], {rules_digest}
+
+        changes = self.index.changes(
+            deck_name, self.replacement_rules, self.hint_rules, hasher.settings_digest()
+        )
+        if changes is None:
+            if self.incremental:
+                print("No rules snapshot under the current voice settings; checking the whole deck.")
+            return None, [], {rules_digest}
+        affected = self.index.affected(deck_name, changes)
+        print(f"{len(changes)} rule entries changed; {len(affected)} notes can match them.")
+        if self.dry_run:
+            for change in changes:
+                scope = "/".join(change.scope)
+                print(f"  [rule] {change.kind} {scope} {change.original}: {change.old} -> {change.new}")
+            for note in affected:
+                print(f"  [affected] note {note.note_id}  {note.source}  {note.sentence[:60]}")
+        return since, [note.note_id for note in affected], {rules_digest, last_digest}
+
+    def resume(self) -> None:
+        """Finish the run recorded in the journal, without re-fetching the deck.
+
+        Notes already linked are dropped, files already stored are only linked, and
+        audio synthesized before the interruption comes from the local cache, even for
+        Regenerate Audio jobs. If the run was cut short while the deck was still
+        streaming in, the journal only holds the jobs planned so far; once those are
+        done, the deck is run again for the rest.
+        """
+        pending = self.journal.load()
+        if pending is None:
+            print("Nothing to resume.")
+            return
+        print(f"Resuming run on {pending.deck_name} started {pending.started}.")
+
+        jobs = []
+        for entry in pending.jobs:
+            # Marked even for finished jobs: if the deck is run again below, its
+            # Regenerate Audio cards for this hash were already paid for.
+            if entry.synthesized:
+                self._fresh.add(entry.audio_hash)
+            notes = {n: c for n, c in entry.notes.items() if n not in entry.linked}
+            if not notes:
                 continue
+            jobs.append(AudioJob(
+                audio_hash=entry.audio_hash,
+                audio_filename=entry.audio_filename,
+                spoken_text=entry.spoken_text,
+                prompt=entry.prompt,
+                notes=notes,
+            ))
+            if entry.stored:
+                self.anki_media.add(entry.audio_filename)
+        print(f"{len(pending.jobs) - len(jobs)} jobs already finished, {len(jobs)} left.")
 
-            output_path = OUTPUT_DIR / pc.audio_filename
-            output_path.write_bytes(mp3_bytes)
+        if self.dry_run:
+            for job in jobs:
+                print(f"  [dry-run] {job.audio_filename}  {job.spoken_text[:60]}")
+        else:
+            self.journal.reopen()
+            self._report(self._execute(jobs, lambda: len(jobs)), saved=0)
+
+        if not pending.complete:
+            print(f"The run stopped before reading all of {pending.deck_name}; running it again.")
+            self.run(pending.deck_name)
+
+    def _execute(
+        self, jobs: Iterable[AudioJob], total: Callable[[], int | None]
+    ) -> Counter[str]:
+        """Synthesize and write back the jobs and re-drive failures; count the sources.
+
+        total() is the job count, or None while jobs are still streaming in.
+        """
+        self.anki_media |= self._anki_media()
+        writer = self.anki.writer(self.write_batch, self.write_interval)
+        sources: Counter[str] = Counter()
+        self._failed = {}
+        self._drain(jobs, writer, sources, total)
+
+        # Re-drive: one more pass over every job that still failed after its retries,
+        # so a blip mid-run doesn't leave cards waiting for the next full run. Jobs
+        # that were synthesized but not written back come from the local cache.
+        if self._failed:
+            retry_jobs = list(self._failed.values())
+            print(f"Re-driving {len(retry_jobs)} failed jobs...")
+            self._failed = {}
+            self._drain(retry_jobs, writer, sources, lambda: len(retry_jobs))
+            if self._failed:
+                print(f"{len(self._failed)} jobs still failed; the next run will pick them up.")
+
+        # Only a run with nothing left over is marked done; otherwise --resume retries
+        # the failures from the journal without re-fetching the deck.
+        if self._failed:
+            self.journal.close()
+        else:
+            self.journal.finish()
+        return sources
+
+    def _report(self, sources: Counter[str], saved: int) -> None:
+        print(
+            f"{sources[SYNTHESIZED]} synthesized, "
+            f"{sources[CACHED]} reused from {self.output_dir.name}/, "
+            f"{sources[IN_ANKI]} already in Anki's media."
+        )
+        if saved:
+            print(f"Saved {saved} TTS calls by sharing audio between duplicate cards.")
+        if self.retry.retries:
+            print(f"Retried transient failures: {self.retry.summary()}.")
+        latency = self.anki.latency_report()
+        if latency:
+            print("AnkiConnect latency:")
+            for line in latency:
+                print(f"  {line}")
+        print("Done.")
 
-            try:
-                self.anki.store_media_file(pc.audio_filename, mp3_bytes)
-                self.anki.update_note_field(
-                    pc.note_id, AUDIO_FIELD, f"[sound:{pc.audio_filename}]"
-                )
-                if pc.force_regenerate:
-                    self.anki.update_note_field(pc.note_id, REGENERATE_FIELD, "")
-            except Exception as e:
-                print(f"  ERROR updating Anki: {e}")
+    def _drain(
+        self,
+        jobs: Iterable[AudioJob],
+        writer: BatchWriter,
+        sources: Counter[str],
+        total: Callable[[], int | None],
+    ) -> None:
+        """Synthesize (or reuse) and write back every job, recording failures in _failed."""
+        for i, (job, result, source) in enumerate(self._synthesize(jobs, writer), 1):
+            n = total()
+            prefix = f"[{i}/{'?' if n is None else n}]"
+            status = f"  ({self.limiter.status()})" if self.limiter.active else ""
+            print(f"{prefix} {job.spoken_text[:60]}{status}")
+            if isinstance(result, Exception):
+                print(f"  ERROR generating audio: {result}")
+                self._fail(job)
                 continue
+            sources[source] += 1
+            if source == SYNTHESIZED:
+                self.cache.put(job.audio_filename, result)
+                self._fresh.add(job.audio_hash)
+                self.journal.record(journal.SYNTHESIZED, job.audio_hash)
+
+            job.written = True
+            self._write_back(writer, job, result)
+        writer.flush()
+
+    def _fail(self, job: AudioJob) -> None:
+        """Queue the job for the re-drive, folding it into another for the same hash."""
+        failed = self._failed.setdefault(job.audio_hash, job)
+        if failed is not job:
+            for note_id, clear in job.notes.items():
+                failed.notes[note_id] = failed.notes.get(note_id, False) or clear
+
+    def _write_back(
+        self, writer: BatchWriter, job: AudioJob, mp3_bytes: bytes | None
+    ) -> None:
+        """Queue the upload and one merged field update per note of the job.
+
+        mp3_bytes is None when Anki already has the file; only the notes are updated.
+        Errors name the file or note they belong to, since with a write batch
+        larger than one they are reported after later cards' progress lines.
+        """
+        notes = job.notes
+        outcomes: dict[int, str | None] = {}
+
+        def on_stored(error: str | None) -> None:
+            if error:
+                print(f"  ERROR updating Anki ({job.audio_filename}): {error}")
+                self._fail(job)
+            else:
+                self.anki_media.add(job.audio_filename)
+                self.journal.record(journal.STORED, job.audio_hash)
+
+        def on_linked(note_id: int, error: str | None) -> None:
+            outcomes[note_id] = error
+            if error:
+                print(f"  ERROR updating Anki (note {note_id}): {error}")
+                self._fail(job)
+            else:
+                self.journal.record(journal.LINKED, job.audio_hash, note_id)
+            if len(outcomes) < len(notes):
+                return
+            updated = sum(1 for e in outcomes.values() if e is None)
+            if updated == 1:
+                print(f"  -> {job.audio_filename}")
+            elif updated:
+                print(f"  -> {job.audio_filename} ({updated} notes)")
+
+        requires = None
+        if mp3_bytes is not None:
+            writer.store_media_file(job.audio_filename, mp3_bytes, on_done=on_stored)
+            requires = job.audio_filename
+        for note_id, clear_regenerate in notes.items():
+            fields = {AUDIO_FIELD: f"[sound:{job.audio_filename}]"}
+            if clear_regenerate:
+                fields[REGENERATE_FIELD] = ""
+            writer.update_note_fields(
+                note_id,
+                fields,
+                requires=requires,
+                on_done=functools.partial(on_linked, note_id),
+            )
+        writer.flush_if_due()
+
+    def _fetch(
+        self, deck_name: str, since: float | None, extra_note_ids: list[int]
+    ) -> Iterator[list[dict]]:
+        """Batches of records for the deck, or only for notes edited since the given time.
+
+        edited:N only has day granularity (and counts from Anki's day rollover), so
+        it's widened by a day and, for notesInfo, narrowed again with each note's mod
+        time. cardsInfo's mod is the card's, which reviews bump, so card records are
+        left at the edited:N superset; the hash check skips the extras.
+
+        extra_note_ids are loaded with notesInfo after the edited ones, skipping any
+        the search already returned.
+        """
+        edited_days = None
+        if since is not None:
+            edited_days = math.ceil((time.time() - since) / 86400) + 1
+            print(
+                f"Only checking notes edited since "
+                f"{datetime.fromtimestamp(since):%Y-%m-%d %H:%M} (edited:{edited_days})."
+            )
+
+        if self.by_note:
+            print(f"Fetching notes from deck: {deck_name}")
+            note_ids = self.anki.find_notes(deck_name, edited_days)
+            print(f"Found {len(note_ids)} notes. Loading note info...")
+            batches = self.anki.notes_info(note_ids)
+            if since is not None:
+                batches = (
+                    [n for n in batch if n.get("mod", since) >= int(since)] for batch in batches
+                )
+        else:
+            print(f"Fetching cards from deck: {deck_name}")
+            card_ids = self.anki.find_cards(deck_name, edited_days)
+            print(f"Found {len(card_ids)} cards. Loading card info...")
+            batches = self.anki.cards_info(card_ids)
+
+        extra = set(extra_note_ids)
+        for batch in batches:
+            # cardsInfo and notesInfo answer {} for a card or note deleted since the
+            # search.
+            batch = [record for record in batch if record]
+            extra.difference_update(_ids(record)[0] for record in batch)
+            yield batch
+        if extra:
+            print(f"Loading {len(extra)} more notes the rule changes can affect...")
+            for batch in self.anki.notes_info(sorted(extra)):
+                yield [note for note in batch if note]
+
+    def _anki_media(self) -> set[str]:
+        """Names of the speech_*.mp3 files already in Anki's media folder."""
+        try:
+            return set(self.anki.media_file_names("speech_*.mp3"))
+        except Exception as e:
+            print(f"Could not list Anki's media files, uploading everything: {e}")
+            return set()
+
+    def _synthesize(
+        self, jobs: Iterable[AudioJob], writer: BatchWriter | None = None
+    ) -> Iterator[tuple[AudioJob, bytes | None | Exception, str]]:
+        """Yield (job, audio, source) in input order.
+
+        audio is the MP3 bytes, None if Anki already has the file, or the exception
+        raised while generating; source is SYNTHESIZED, CACHED or IN_ANKI. Only jobs
+        that _reuse() can't serve reach the TTS API. With more than one worker,
+        synthesis runs on a thread pool with at most 2 * workers calls in flight;
+        with async_requests set, it runs as coroutines on one event-loop thread with
+        that many in flight. Results are still yielded in input order, so the caller
+        writes files and updates Anki on the main thread as before.
+
+        While waiting on a result, the main thread flushes the writer whenever its
+        interval comes due. With a writer that buffers, a single worker gets a
+        one-thread pool too, since an inline call would hold the buffer with it.
+        """
+        if self.async_requests:
+            executor = _EventLoopThread(on_close=self.generator.aclose)
+            work = self._agenerate
+            max_in_flight = self.async_requests
+        elif self.workers > 1 or (writer is not None and writer.flush_size > 1):
+            executor = ThreadPoolExecutor(max_workers=self.workers)
+            work = self._generate
+            max_in_flight = self.workers * 2
+        else:
+            for job in jobs:
+                reused = self._reuse(job)
+                if reused is not None:
+                    yield job, *reused
+                else:
+                    yield job, _wait(self._generate(job)), SYNTHESIZED
+            return
 
-            print(f"  -> {pc.audio_filename}")
+        with executor:
+            pending: deque[tuple[AudioJob, tuple[bytes | None, str] | Future]] = deque()
+            for job in jobs:
+                item = self._reuse(job)
+                if item is None:
+                    item = executor.submit(work, job)
+                pending.append((job, item))
+                if len(pending) >= max_in_flight:
+                    yield _settle(*pending.popleft(), writer)
+            while pending:
+                yield _settle(*pending.popleft(), writer)
+
+    def _reuse(self, job: AudioJob) -> tuple[bytes | None, str] | None:
+        """Audio for the job that doesn't need the TTS API, or None to synthesize.
+
+        The hashed filename identifies the audio, so a file Anki already has only
+        needs linking, and one in the local cache only needs uploading. Regenerate
+        Audio skips both, unless this run already synthesized the file. Without
+        use_cache, the cache is still read for files this run, or the run it
+        resumes, synthesized: they can't be stale, and the re-drive and --resume
+        must not pay for them twice.
+        """
+        if job.force_regenerate and job.audio_hash not in self._fresh:
+            return None
+        if job.audio_filename in self.anki_media:
+            return None, IN_ANKI
+        if self.use_cache or job.audio_hash in self._fresh:
+            data = self.cache.get(job.audio_filename)
+            if data is not None:
+                return data, CACHED
+        return None
 
-        print("Done.")
+    async def _agenerate(self, job: AudioJob) -> bytes | Exception:
+        try:
+            if isinstance(self.generator, PcmAudioGenerator):
+                pcm = await self.retry.acall(
+                    self.limiter.acall, self.generator.asynthesize, job.spoken_text, job.prompt
+                )
+                return await self.generator.aencode(pcm)
+            return await self.retry.acall(
+                self.limiter.acall, self.generator.agenerate, job.spoken_text, job.prompt
+            )
+        except Exception as e:
+            return e
+
+    def _generate(self, job: AudioJob) -> bytes | Future | Exception:
+        """Synthesize the job's audio, or return the exception raised.
+
+        For a PcmAudioGenerator only the network half runs here: the PCM is handed to
+        encode_async() and a Future for the MP3 is returned, so this thread can start
+        the next TTS request while a worker process encodes.
+        """
+        try:
+            if isinstance(self.generator, PcmAudioGenerator):
+                pcm = self.retry.call(
+                    self.limiter.call, self.generator.synthesize, job.spoken_text, job.prompt
+                )
+                return self.generator.encode_async(pcm)
+            return self.retry.call(
+                self.limiter.call, self.generator.generate, job.spoken_text, job.prompt
+            )
+        except Exception as e:
+            return e
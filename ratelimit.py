@@ -0,0 +1,182 @@
+import asyncio
+import itertools
+import threading
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+# Seconds of budget a bucket may save up, so an idle pause doesn't turn into a burst
+# that trips the quota straight away.
+BURST_SECONDS = 5.0
+QUOTA_ATTEMPTS = 5
+QUOTA_BACKOFF = 2.0
+_POLL = 0.05
+
+
+def is_quota_error(exc: BaseException) -> bool:
+    """True for Cloud TTS RESOURCE_EXHAUSTED / HTTP 429 errors, by type or status code.
+
+    The message is never inspected: a sentence or id containing "429" isn't a quota
+    error.
+    """
+    names = {cls.__name__ for cls in type(exc).__mro__}
+    if names & {"ResourceExhausted", "TooManyRequests"}:
+        return True
+    # google.api_core errors carry the HTTP status as .code and the gRPC status as
+    # .grpc_status_code; requests' HTTPError carries the response.
+    if getattr(exc, "code", None) == 429:
+        return True
+    grpc_status = getattr(exc, "grpc_status_code", None)
+    if getattr(grpc_status, "name", None) == "RESOURCE_EXHAUSTED":
+        return True
+    return getattr(getattr(exc, "response", None), "status_code", None) == 429
+
+
+class _TokenBucket:
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * BURST_SECONDS)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_for(self, amount: float) -> float:
+        """Seconds until `amount` tokens are available (0 if they are now).
+
+        A request bigger than the whole bucket only needs a full bucket.
+        """
+        needed = min(amount, self.capacity) - self.tokens
+        return max(0.0, needed / self.rate)
+
+
+class RateLimiter:
+    """Request and character budgets plus AIMD concurrency for TTS calls.
+
+    acquire() blocks until there is budget in every token bucket (requests/min and
+    characters/min, either optional) and a free concurrency slot. The concurrency
+    limit starts at max_concurrency, so --workers/--async run at full width until the
+    API pushes back. A RESOURCE_EXHAUSTED error halves it, at most once per backoff
+    period, and pauses new calls for that long (multiplicative decrease); after that
+    it grows by roughly one slot per limit's worth of successful calls (additive
+    increase).
+    call()/acall() wrap one request and retry it on quota errors, so a throttled
+    card waits its turn instead of being skipped.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float | None = None,
+        chars_per_minute: float | None = None,
+        max_concurrency: int = 1,
+        quota_attempts: int = QUOTA_ATTEMPTS,
+        backoff: float = QUOTA_BACKOFF,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.quota_attempts = quota_attempts
+        self.backoff = backoff
+        self._requests = _TokenBucket(requests_per_minute) if requests_per_minute else None
+        self._chars = _TokenBucket(chars_per_minute) if chars_per_minute else None
+        self._limit = float(self.max_concurrency)
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._completed: deque[float] = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        """Whether the limiter can ever hold a call back."""
+        return bool(self._requests or self._chars or self.max_concurrency > 1)
+
+    def status(self) -> str:
+        with self._lock:
+            self._trim(time.monotonic())
+            rate = len(self._completed)
+            limit = int(self._limit)
+        return f"{rate} req/min, {limit} in flight max"
+
+    def acquire(self, chars: int) -> None:
+        while (wait := self._try_acquire(chars)) > 0:
+            time.sleep(wait)
+
+    async def aacquire(self, chars: int) -> None:
+        while (wait := self._try_acquire(chars)) > 0:
+            await asyncio.sleep(wait)
+
+    def release(self, throttled: bool = False, succeeded: bool = False) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._in_flight -= 1
+            if throttled:
+                if now >= self._paused_until:
+                    self._limit = max(1.0, self._limit / 2)
+                self._paused_until = max(self._paused_until, now + self.backoff)
+            elif succeeded:
+                self._limit = min(self.max_concurrency, self._limit + 1 / self._limit)
+                self._completed.append(now)
+                self._trim(now)
+
+    def call(self, fn: Callable[..., T], text: str, *args: Any) -> T:
+        for attempt in itertools.count(1):
+            self.acquire(len(text))
+            try:
+                result = fn(text, *args)
+            except Exception as e:
+                quota = is_quota_error(e)
+                self.release(throttled=quota)
+                if not quota or attempt >= self.quota_attempts:
+                    raise
+            except BaseException:
+                self.release()  # cancelled or interrupted: give the slot back
+                raise
+            else:
+                self.release(succeeded=True)
+                return result
+
+    async def acall(self, fn: Callable[..., Awaitable[T]], text: str, *args: Any) -> T:
+        for attempt in itertools.count(1):
+            await self.aacquire(len(text))
+            try:
+                result = await fn(text, *args)
+            except Exception as e:
+                quota = is_quota_error(e)
+                self.release(throttled=quota)
+                if not quota or attempt >= self.quota_attempts:
+                    raise
+            except BaseException:
+                self.release()  # cancelled or interrupted: give the slot back
+                raise
+            else:
+                self.release(succeeded=True)
+                return result
+
+    def _try_acquire(self, chars: int) -> float:
+        """Take a slot and the budget for one call and return 0, or return how long to wait."""
+        now = time.monotonic()
+        with self._lock:
+            if now < self._paused_until:
+                return self._paused_until - now
+            if self._in_flight >= int(self._limit):
+                return _POLL
+            wait = 0.0
+            for bucket, amount in ((self._requests, 1), (self._chars, chars)):
+                if bucket is not None:
+                    bucket.refill(now)
+                    wait = max(wait, bucket.wait_for(amount))
+            if wait > 0:
+                return wait
+            if self._requests is not None:
+                self._requests.tokens -= 1
+            if self._chars is not None:
+                self._chars.tokens -= min(chars, self._chars.capacity)
+            self._in_flight += 1
+            return 0.0
+
+    def _trim(self, now: float) -> None:
+        while self._completed and now - self._completed[0] > 60.0:
+            self._completed.popleft()
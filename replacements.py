@@ -1,5 +1,15 @@
+import functools
 import json
 import re
+from collections import OrderedDict, deque
+from collections.abc import Iterable
+
+_PAGES_RE = re.compile(r"([A-Za-z]*)(\d[\d,]*)")
+
+# Below this many originals, a plain `in` check per key beats walking the automaton.
+_AUTOMATON_MIN_SIZE = 32
+# How many scope mappings get_applicable() keeps compiled matchers for.
+_MATCHER_CACHE_SIZE = 64
 
 
 def load(path: str) -> dict:
@@ -24,7 +34,7 @@ def _parse_source(source: str) -> tuple[str | None, str | None, list[str]]:
     if len(parts) >= 3:
         page_str = parts[2]  # e.g. "P11,12"
         # Extract leading prefix (e.g. "P") and comma-separated numbers
-        m = re.match(r"([A-Za-z]*)(\d[\d,]*)", page_str)
+        m = _PAGES_RE.match(page_str)
         if m:
             prefix = m.group(1)  # usually "P"
             numbers = m.group(2).split(",")
@@ -32,6 +42,113 @@ def _parse_source(source: str) -> tuple[str | None, str | None, list[str]]:
     return manga, volume, pages
 
 
+def scope_paths(source_value: str) -> list[tuple[str, ...]]:
+    """Scope paths that apply to a Source value, broadest first.
+
+    Paths are keys into the flattened rules: ("*",), (manga, "*"),
+    (manga, volume, "*") and (manga, volume, page) for each page.
+    """
+    manga, volume, pages = _parse_source(source_value)
+    paths = [("*",)]
+    if manga:
+        paths.append((manga, "*"))
+        if volume:
+            paths.append((manga, volume, "*"))
+            paths.extend((manga, volume, page) for page in pages)
+    return paths
+
+
+class _Matcher:
+    """Aho-Corasick automaton that finds which of a fixed set of strings occur in a text.
+
+    Built once per scope mapping; find() is a single pass over the text regardless of
+    how many originals the scope holds.
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self._goto: list[dict[str, int]] = [{}]
+        self._out: list[list[str]] = [[]]
+        self._always: list[str] = []
+        for pattern in patterns:
+            if not pattern:
+                self._always.append(pattern)  # "" in s is always True
+                continue
+            state = 0
+            for ch in pattern:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._out.append([])
+                state = nxt
+            self._out[state].append(pattern)
+
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def occurrences(self, text: str) -> list[tuple[int, str]]:
+        """Every (start, pattern) occurrence in text, overlapping ones included."""
+        found = []
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for end, ch in enumerate(text, 1):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for pattern in out[state]:
+                found.append((end - len(pattern), pattern))
+        return found
+
+    def find(self, text: str) -> set[str]:
+        found = set(self._always)
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+
+# id(mapping) -> (mapping, matcher), least recently used first. The mapping is kept
+# alive alongside its matcher so the id can't be reused by a different dict while the
+# entry exists, which is why the cache is bounded.
+_matchers: OrderedDict[int, tuple[dict, _Matcher]] = OrderedDict()
+
+
+def _matching(mapping: dict, clean_sentence: str) -> Iterable[str]:
+    """Originals in the scope mapping that occur in clean_sentence.
+
+    Scope mappings are treated as read-only once loaded; large ones are compiled into a
+    _Matcher on first use and reused for later sentences, for the _MATCHER_CACHE_SIZE
+    most recently used mappings.
+    """
+    if len(mapping) < _AUTOMATON_MIN_SIZE:
+        return [original for original in mapping if original in clean_sentence]
+    entry = _matchers.get(id(mapping))
+    if entry is None or entry[0] is not mapping:
+        entry = (mapping, _Matcher(mapping))
+        _matchers[id(mapping)] = entry
+        if len(_matchers) > _MATCHER_CACHE_SIZE:
+            _matchers.popitem(last=False)
+    else:
+        _matchers.move_to_end(id(mapping))
+    return entry[1].find(clean_sentence)
+
+
 def get_applicable(
     replacements_data: dict, clean_sentence: str, source_value: str
 ) -> list[tuple[str, str]]:
@@ -39,9 +156,8 @@ def get_applicable(
     collected: dict[str, str] = {}
 
     def _collect(mapping: dict) -> None:
-        for original, reading in mapping.items():
-            if original in clean_sentence:
-                collected[original] = reading
+        for original in _matching(mapping, clean_sentence):
+            collected[original] = mapping[original]
 
     # Global replacements
     if "*" in replacements_data:
@@ -68,6 +184,68 @@ def get_applicable(
     return sorted(collected.items())
 
 
+class CompiledRules:
+    """A replacements.json/hints.json mapping compiled for per-card lookups.
+
+    The series/volume/page nesting is flattened once into a dict keyed by scope path,
+    and each large scope gets its own matcher, built once. For each distinct Source
+    value only the list of scopes that apply (broadest first) is cached, so a deck
+    with thousands of page-level Sources shares the same few matchers instead of
+    merging and compiling the rules per Source. applicable() runs each scope's
+    matcher and lets more specific scopes override, which returns exactly what
+    get_applicable() does for the same data.
+    """
+
+    def __init__(self, data: dict):
+        self.data = data
+        self._scopes: dict[tuple[str, ...], dict] = {}
+        for key, value in data.items():
+            if key == "*":
+                self._scopes[("*",)] = value
+                continue
+            for volume, volume_data in value.items():
+                if volume == "*":
+                    self._scopes[(key, "*")] = volume_data
+                    continue
+                for page, page_data in volume_data.items():
+                    self._scopes[(key, volume, page)] = page_data
+        self._matchers: dict[tuple[str, ...], _Matcher] = {
+            path: _Matcher(mapping)
+            for path, mapping in self._scopes.items()
+            if len(mapping) >= _AUTOMATON_MIN_SIZE
+        }
+        self._chains: dict[str, list[tuple[dict, _Matcher | None]]] = {}
+
+    def applicable(self, clean_sentence: str, source_value: str) -> list[tuple[str, str]]:
+        """Return a sorted list of (original, reading) pairs that apply to this sentence."""
+        chain = self._chains.get(source_value)
+        if chain is None:
+            chain = self._chain(source_value)
+            self._chains[source_value] = chain
+        collected: dict[str, str] = {}
+        for mapping, matcher in chain:
+            if matcher is None:
+                found = [original for original in mapping if original in clean_sentence]
+            else:
+                found = matcher.find(clean_sentence)
+            for original in found:
+                collected[original] = mapping[original]
+        return sorted(collected.items())
+
+    def entries(self) -> Iterable[tuple[tuple[str, ...], str, str]]:
+        """Every (scope path, original, reading) in the data."""
+        for path, mapping in self._scopes.items():
+            for original, reading in mapping.items():
+                yield path, original, reading
+
+    def _chain(self, source_value: str) -> list[tuple[dict, _Matcher | None]]:
+        return [
+            (self._scopes[path], self._matchers.get(path))
+            for path in scope_paths(source_value)
+            if path in self._scopes
+        ]
+
+
 def parse_pairs(field_value: str) -> list[tuple[str, str]]:
     """Parse a card field (Replacements or Hints) into (original, reading) pairs.
 
@@ -99,6 +277,78 @@ def apply_readings(clean_sentence: str, applicable: list[tuple[str, str]]) -> st
     original and can't cascade into a later substitution. Returns the sentence
     unchanged when there are no replacements.
     """
+    if not applicable:
+        return clean_sentence
+    substitution = _substitution(tuple(applicable))
+    if substitution is None:
+        return _apply_sequentially(clean_sentence, applicable)
+    return substitution.apply(clean_sentence)
+
+
+class _Substitution:
+    """Single-pass equivalent of _apply_sequentially for one set of pairs.
+
+    One automaton pass finds every occurrence of every original. Occurrences are then
+    claimed in the order the sequential version would substitute them: longest
+    original first, and left to right within one original. An occurrence that
+    overlaps an already claimed one is dropped, just as str.replace would no longer
+    see it once the text under it had been rewritten. The output is assembled once.
+    """
+
+    def __init__(self, pairs: tuple[tuple[str, str], ...]):
+        self._ordered = sorted(pairs, key=lambda pair: len(pair[0]), reverse=True)
+        self._matcher = _Matcher(original for original, _ in pairs)
+
+    def apply(self, text: str) -> str:
+        starts: dict[str, list[int]] = {}
+        for start, original in self._matcher.occurrences(text):
+            starts.setdefault(original, []).append(start)
+        if not starts:
+            return text
+
+        claimed = [False] * len(text)
+        spans: list[tuple[int, int, str]] = []
+        for original, reading in self._ordered:
+            size = len(original)
+            next_free = 0
+            for start in starts.pop(original, ()):
+                end = start + size
+                if start < next_free or any(claimed[start:end]):
+                    continue
+                claimed[start:end] = [True] * size
+                spans.append((start, end, reading))
+                next_free = end
+
+        parts = []
+        pos = 0
+        for start, end, reading in sorted(spans):
+            parts.append(text[pos:start])
+            parts.append(reading)
+            pos = end
+        parts.append(text[pos:])
+        return "".join(parts)
+
+
+@functools.lru_cache(maxsize=4096)
+def _substitution(pairs: tuple[tuple[str, str], ...]) -> _Substitution | None:
+    """Compiled substitution for these pairs, or None if it could differ from the original.
+
+    The single pass assumes a substitution can never create or break a match for a
+    later one. That holds when no reading shares a character with any original, which
+    is the normal kana-for-kanji case. Empty strings and any shared character fall
+    back to _apply_sequentially.
+    """
+    originals = {original for original, _ in pairs}
+    readings = [reading for _, reading in pairs]
+    if "" in originals or "" in readings:
+        return None
+    original_chars = set().union(*originals)
+    if any(ch in original_chars for reading in readings for ch in reading):
+        return None
+    return _Substitution(pairs)
+
+
+def _apply_sequentially(clean_sentence: str, applicable: list[tuple[str, str]]) -> str:
     text = clean_sentence
     for original, reading in sorted(applicable, key=lambda pair: len(pair[0]), reverse=True):
         text = text.replace(original, reading)
@@ -0,0 +1,101 @@
+import asyncio
+import random
+import threading
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+MAX_ATTEMPTS = 4
+BASE_DELAY = 0.5
+MAX_DELAY = 30.0
+RUN_BUDGET = 200
+
+# Exception classes worth another try, matched by name so this module depends on
+# neither the Google client nor anki.py. Quota errors (ResourceExhausted, 429) are
+# left to RateLimiter, which already retries them with its own backoff; retrying
+# them here too would multiply the attempts and drain the run's budget.
+_RETRYABLE_NAMES = {
+    "AnkiConnectionError",
+    "ServiceUnavailable",
+    "DeadlineExceeded",
+    "InternalServerError",
+    "Aborted",
+    "GatewayTimeout",
+    "BadGateway",
+}
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Whether exc looks transient: a network blip, timeout, or server-side hiccup.
+
+    Bad requests, missing notes, and other errors that would fail the same way again
+    are not retryable.
+    """
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    return any(cls.__name__ in _RETRYABLE_NAMES for cls in type(exc).__mro__)
+
+
+class RetryPolicy:
+    """Capped exponential backoff with full jitter, drawing on one budget per run.
+
+    Attempt n waits a random time in [0, min(max_delay, base_delay * 2**(n-1))]. Every
+    retry, from any caller, spends one unit of the shared budget. Once the budget is
+    gone, calls still make their first attempt but fail fast after it, so a dead
+    AnkiConnect or TTS endpoint can't stretch a run out indefinitely.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = MAX_ATTEMPTS,
+        base_delay: float = BASE_DELAY,
+        max_delay: float = MAX_DELAY,
+        budget: int = RUN_BUDGET,
+        retryable: Callable[[BaseException], bool] = is_retryable,
+    ):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self.retryable = retryable
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def call(self, fn: Callable[..., T], *args: Any) -> T:
+        attempt = 1
+        while True:
+            try:
+                return fn(*args)
+            except Exception as e:
+                if not self._should_retry(e, attempt):
+                    raise
+            time.sleep(self._delay(attempt))
+            attempt += 1
+
+    async def acall(self, fn: Callable[..., Awaitable[T]], *args: Any) -> T:
+        attempt = 1
+        while True:
+            try:
+                return await fn(*args)
+            except Exception as e:
+                if not self._should_retry(e, attempt):
+                    raise
+            await asyncio.sleep(self._delay(attempt))
+            attempt += 1
+
+    def summary(self) -> str:
+        return f"{self.retries} retries used of a budget of {self.budget}"
+
+    def _should_retry(self, exc: Exception, attempt: int) -> bool:
+        if attempt >= self.max_attempts or not self.retryable(exc):
+            return False
+        with self._lock:
+            if self.retries >= self.budget:
+                return False
+            self.retries += 1
+            return True
+
+    def _delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
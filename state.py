@@ -0,0 +1,39 @@
+import json
+import os
+import tempfile
+from pathlib import Path
+
+
+class RunState:
+    """Per-deck record of the last clean run, kept as JSON next to the audio cache.
+
+    For each deck it stores when that run started and the rules digest it ran with,
+    so the next run can tell whether only edited notes need checking or the rules,
+    the voice settings or HASH_VERSION have moved since.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    def last(self, deck_name: str) -> tuple[float, str] | None:
+        """(start time, rules digest) of the deck's last clean run, if there was one."""
+        entry = self._load().get(deck_name)
+        if not entry:
+            return None
+        return entry["started"], entry["rules"]
+
+    def mark(self, deck_name: str, rules_digest: str, started: float) -> None:
+        decks = self._load()
+        decks[deck_name] = {"started": started, "rules": rules_digest}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"decks": decks}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f).get("decks", {})
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
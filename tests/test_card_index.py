@@ -0,0 +1,190 @@
+import copy
+import random
+import tempfile
+import unittest
+from pathlib import Path
+
+import fake_anki
+import processor
+import replacements as rpl
+from card_index import CardIndex, IndexEntry
+
+DECK = fake_anki.DECK
+SETTINGS = "settings"
+_WORDS = ("明日", "日", "小路", "明日小路", "曲", "目")
+
+
+def _note(collection: fake_anki.Collection, sentence: str, source: str) -> int:
+    note = collection.add_note(DECK, {
+        processor.SENTENCE_FIELD: sentence,
+        processor.AUDIO_FIELD: "",
+        processor.SOURCE_FIELD: source,
+        processor.REGENERATE_FIELD: "",
+        processor.CARD_REPLACEMENTS_FIELD: "",
+        processor.CARD_HINTS_FIELD: "",
+    })
+    return note.note_id
+
+
+def _hashes(
+    collection: fake_anki.Collection, replacements: dict, hints: dict
+) -> dict[int, str]:
+    """Each note's audio hash, built from scratch under the given rules."""
+    replacement_rules, hint_rules = rpl.CompiledRules(replacements), rpl.CompiledRules(hints)
+    hashes = {}
+    for note_id in collection.notes:
+        pc = processor._build(collection.note_info(note_id), replacement_rules, hint_rules)
+        hashes[note_id] = pc.audio_hash
+    return hashes
+
+
+class AffectedTest(unittest.TestCase):
+    """affected() must reach every note a rebuild under the new rules would change."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory(prefix="test_card_index_")
+        self.addCleanup(directory.cleanup)
+        self.index = CardIndex(Path(directory.name) / "index.sqlite3")
+        self.addCleanup(self.index.close)
+        self.collection = fake_anki.Collection()
+
+    def record(self, replacements: dict, hints: dict) -> None:
+        """Index every note under the rules, as a clean full run would."""
+        replacement_rules, hint_rules = rpl.CompiledRules(replacements), rpl.CompiledRules(hints)
+        entries = []
+        for note_id in self.collection.notes:
+            raw = self.collection.note_info(note_id)
+            pc = processor._build(raw, replacement_rules, hint_rules)
+            entries.append(IndexEntry(
+                note_id=pc.note_id,
+                source=pc.source,
+                sentence=pc.clean_sentence,
+                matched=processor._matched(pc),
+                fingerprint=processor._fingerprint(raw),
+                audio_hash=pc.audio_hash,
+            ))
+        self.index.stage(entries, self.collection.notes)
+        self.index.record(
+            DECK, replacement_rules, hint_rules, SETTINGS, "digest", full=True
+        )
+
+    def affected(
+        self, old: tuple[dict, dict], new: tuple[dict, dict]
+    ) -> tuple[set[int], set[int]]:
+        """(notes affected() returns, notes whose hash a rebuild changes) for old -> new."""
+        self.record(*old)
+        changes = self.index.changes(
+            DECK, rpl.CompiledRules(new[0]), rpl.CompiledRules(new[1]), SETTINGS
+        )
+        affected = {note.note_id for note in self.index.affected(DECK, changes)}
+        before, after = _hashes(self.collection, *old), _hashes(self.collection, *new)
+        return affected, {n for n in before if before[n] != after[n]}
+
+    def check(self, old: tuple[dict, dict], new: tuple[dict, dict], expected: set[int]):
+        affected, rebuilt = self.affected(old, new)
+        self.assertEqual(affected, expected)
+        self.assertLessEqual(rebuilt, affected)
+
+    def test_added_changed_and_removed_entries(self):
+        asu = _note(self.collection, "明日です。", "ASU V1 P1")
+        ins = _note(self.collection, "小路です。", "INS V1 P1")
+        kyoku = _note(self.collection, "曲です。", "INS V1 P1")
+        old = ({"*": {"明日": "あした"}, "INS": {"*": {"小路": "こうじ"}}}, {})
+        added = ({"*": {"明日": "あした", "曲": "き"}, "INS": {"*": {"小路": "こうじ"}}}, {})
+        changed = ({"*": {"明日": "あす"}, "INS": {"*": {"小路": "こうじ"}}}, {})
+        removed = ({"*": {"明日": "あした"}}, {})
+        with self.subTest("added"):
+            self.check(old, added, {kyoku})
+        with self.subTest("changed"):
+            self.check(old, changed, {asu})
+        with self.subTest("removed"):
+            self.check(old, removed, {ins})
+
+    def test_scope_against_source(self):
+        page = _note(self.collection, "明日です。", "INS V1 P1")
+        two_pages = _note(self.collection, "明日です。", "INS V1 P2,3")
+        other_page = _note(self.collection, "明日です。", "INS V1 P4")
+        other_volume = _note(self.collection, "明日です。", "INS V2 P1")
+        other_series = _note(self.collection, "明日です。", "ASU V1 P1")
+        no_source = _note(self.collection, "明日です。", "")
+        old = ({}, {})
+        cases = {
+            "page": ({"INS": {"V1": {"P1": {"明日": "あす"}}}}, {page}),
+            "second page": ({"INS": {"V1": {"P3": {"明日": "あす"}}}}, {two_pages}),
+            "volume": (
+                {"INS": {"V1": {"*": {"明日": "あす"}}}},
+                {page, two_pages, other_page},
+            ),
+            "series": (
+                {"INS": {"*": {"明日": "あす"}}},
+                {page, two_pages, other_page, other_volume},
+            ),
+            "global": (
+                {"*": {"明日": "あす"}},
+                {page, two_pages, other_page, other_volume, other_series, no_source},
+            ),
+        }
+        for name, (replacements, expected) in cases.items():
+            with self.subTest(name):
+                self.check(old, (replacements, {}), expected)
+
+    def test_hint_filtered_out_by_replacement(self):
+        # The replacement substitutes 明日 away, so the 日 hint never reaches the
+        # prompt and changing it moves no hash; the note didn't match it either.
+        note = _note(self.collection, "明日です。", "INS V1 P1")
+        replacements, hints = {"*": {"明日": "あした"}}, {"*": {"日": "ひ"}}
+        with self.subTest("hint changed"):
+            self.check((replacements, hints), (replacements, {"*": {"日": "にち"}}), set())
+        with self.subTest("replacement removed"):
+            # Now the hint applies: the note is reached through the replacement.
+            self.check((replacements, hints), ({}, hints), {note})
+
+    def test_random_rule_edits(self):
+        rng = random.Random(5)
+        sources = ["", "INS V1 P1", "INS V1 P2,3", "INS V2 P1", "ASU V1 P1", "ASU V3 P9"]
+        for _ in range(40):
+            self.collection = fake_anki.Collection()
+            for _ in range(30):
+                sentence = "".join(rng.choices("明日小路曲目のが", k=rng.randint(1, 8)))
+                _note(self.collection, sentence, rng.choice(sources))
+            old = (_random_rules(rng), _random_rules(rng))
+            new = tuple(_edit(rng, rules) for rules in old)
+            with self.subTest(old=old, new=new):
+                affected, rebuilt = self.affected(old, new)
+                self.assertLessEqual(rebuilt, affected)
+
+
+_SCOPES = (("*",), ("INS", "*"), ("INS", "V1", "*"), ("INS", "V1", "P1"), ("ASU", "V1", "P1"))
+
+
+def _reading(rng: random.Random) -> str:
+    return "".join(rng.choices("あしたこみち", k=rng.randint(1, 3)))
+
+
+def _random_rules(rng: random.Random) -> dict:
+    data: dict = {}
+    for _ in range(rng.randint(0, 6)):
+        mapping = data
+        for key in rng.choice(_SCOPES):
+            mapping = mapping.setdefault(key, {})
+        mapping[rng.choice(_WORDS)] = _reading(rng)
+    return data
+
+
+def _edit(rng: random.Random, data: dict) -> dict:
+    """A copy with a few entries added, changed or removed."""
+    data = copy.deepcopy(data)
+    for _ in range(rng.randint(1, 3)):
+        mapping = data
+        for key in rng.choice(_SCOPES):
+            mapping = mapping.setdefault(key, {})
+        word = rng.choice(_WORDS)
+        if word in mapping and rng.random() < 0.5:
+            del mapping[word]
+        else:
+            mapping[word] = _reading(rng)
+    return data
+
+
+if __name__ == "__main__":
+    unittest.main()
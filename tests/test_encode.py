@@ -0,0 +1,48 @@
+import os
+import shutil
+import signal
+import time
+import unittest
+
+from audio import encode
+from audio.encode import EncoderPool, EncodeSettings
+
+SETTINGS = EncodeSettings(sample_rate=24000, bitrate="128k")
+
+
+@unittest.skipUnless(
+    encode.lameenc is not None or shutil.which("ffmpeg"), "needs lameenc or ffmpeg"
+)
+class EncoderPoolTest(unittest.TestCase):
+    def pool(self, workers: int, timeout: float) -> EncoderPool:
+        pool = EncoderPool(workers, timeout=timeout)
+        self.addCleanup(pool.close)
+        pool.check()  # start the workers before anything is timed
+        return pool
+
+    def test_backlog_is_not_mistaken_for_a_hang(self):
+        # Each card encodes well inside the timeout, but the whole queue takes several
+        # timeouts to get through. Only a card a worker has taken should be timed.
+        pcm = b"\x01\x02" * SETTINGS.sample_rate * 40
+        pool = self.pool(workers=2, timeout=0.5)
+        executor = pool._executor
+        start = time.monotonic()
+        futures = [pool.submit(pcm, SETTINGS) for _ in range(40)]
+        for future in futures:
+            self.assertTrue(future.result(timeout=120))
+        self.assertGreater(time.monotonic() - start, pool.timeout * 2)
+        self.assertIs(pool._executor, executor)
+
+    @unittest.skipUnless(hasattr(signal, "SIGSTOP"), "needs SIGSTOP")
+    def test_hung_worker_is_replaced(self):
+        pool = self.pool(workers=1, timeout=1.0)
+        executor = pool._executor
+        # A stopped worker stands in for one stuck mid-card: alive, but never answering.
+        for process in executor._processes.values():
+            os.kill(process.pid, signal.SIGSTOP)
+        self.assertTrue(pool.encode(b"\x01\x02" * SETTINGS.sample_rate, SETTINGS))
+        self.assertIsNot(pool._executor, executor)
+
+
+if __name__ == "__main__":
+    unittest.main()
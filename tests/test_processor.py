@@ -0,0 +1,222 @@
+import contextlib
+import io
+import tempfile
+import unittest
+from collections import Counter
+from pathlib import Path
+from unittest import mock
+
+import fake_anki
+import hasher
+import processor
+from anki import AnkiClient
+from audio.base import AudioGenerator
+from processor import Processor
+
+DECK = fake_anki.DECK
+
+
+class CountingGenerator(AudioGenerator):
+    """Returns a tiny MP3-looking payload per text and counts the calls that paid off.
+
+    After `limit` successful calls it raises KeyboardInterrupt instead, as if the run
+    had been killed while that call was in flight.
+    """
+
+    def __init__(self, limit: int | None = None):
+        self.limit = limit
+        self.texts: Counter[str] = Counter()
+
+    def generate(self, text: str, prompt: str = "") -> bytes:
+        if self.limit is not None and sum(self.texts.values()) >= self.limit:
+            raise KeyboardInterrupt
+        self.texts[text] += 1
+        return b"ID3" + text.encode("utf-8")
+
+
+def _fields(sentence: str, source: str = "INS V1 P1", regenerate: bool = False) -> dict:
+    return {
+        processor.SENTENCE_FIELD: sentence,
+        processor.AUDIO_FIELD: "",
+        processor.SOURCE_FIELD: source,
+        processor.REGENERATE_FIELD: "1" if regenerate else "",
+        processor.CARD_REPLACEMENTS_FIELD: "",
+        processor.CARD_HINTS_FIELD: "",
+    }
+
+
+class PipelineTestCase(unittest.TestCase):
+    """Runs Processor against fake_anki over HTTP, with its own output directory."""
+
+    def setUp(self):
+        self.collection = fake_anki.Collection()
+        self.serve(fake_anki.FakeAnkiConnect(self.collection))
+        output_dir = tempfile.TemporaryDirectory(prefix="test_processor_")
+        self.addCleanup(output_dir.cleanup)
+        self.output_dir = Path(output_dir.name)
+
+    def serve(self, anki: fake_anki.FakeAnkiConnect) -> None:
+        """Point processors made after this at a server for anki."""
+        self.server = fake_anki.FakeAnkiServer(anki).start()
+        self.addCleanup(self.server.stop)
+
+    def processor(
+        self,
+        generator: AudioGenerator,
+        replacements: dict | None = None,
+        hints: dict | None = None,
+        batch_size: int | None = None,
+        **kwargs,
+    ) -> Processor:
+        client = AnkiClient(url=self.server.url, batch_size=batch_size, fetch_window=1)
+        self.addCleanup(client.close)
+        proc = Processor(
+            anki=client,
+            generator=generator,
+            replacements_data=replacements or {},
+            hints_data=hints or {},
+            output_dir=self.output_dir,
+            **kwargs,
+        )
+        self.addCleanup(proc.close)
+        return proc
+
+    def quietly(self, fn, *args) -> None:
+        with contextlib.redirect_stdout(io.StringIO()):
+            fn(*args)
+
+    def assert_all_linked(self) -> None:
+        """Every note points at audio Anki has, and no Regenerate Audio is left set."""
+        for note in self.collection.notes.values():
+            audio = note.fields[processor.AUDIO_FIELD]
+            with self.subTest(note=note.note_id):
+                self.assertRegex(audio, r"^\[sound:speech_\w+\.mp3\]$")
+                self.assertIn(audio[len("[sound:") : -1], self.collection.media)
+                self.assertEqual(note.fields[processor.REGENERATE_FIELD], "")
+
+
+class ResumeTest(PipelineTestCase):
+    """A run killed partway through, then --resume: nothing is synthesized twice."""
+
+    def test_buffered_writes_lost_without_cache(self):
+        # With a large write batch nothing reaches Anki before the kill, so resume has
+        # to take every journaled synthesis from the cache, even under --no-cache.
+        for i in range(6):
+            self.collection.add_note(DECK, _fields(f"文{i}です。"))
+        first = CountingGenerator(limit=3)
+        with self.assertRaises(KeyboardInterrupt):
+            self.quietly(self.processor(first, write_batch=100, use_cache=False).run, DECK)
+        self.assertEqual(sum(first.texts.values()), 3)
+        self.assertFalse(self.collection.media)
+
+        second = CountingGenerator()
+        self.quietly(self.processor(second, use_cache=False).resume)
+        self.assertFalse(first.texts & second.texts)
+        self.assertEqual(sum(second.texts.values()), 3)
+        self.assert_all_linked()
+
+    def test_finished_jobs_stay_paid_for_when_the_deck_is_rerun(self):
+        # Killed while the deck was still streaming in, so resume runs it again. The
+        # Regenerate Audio note in the last batch shares the first note's audio,
+        # which the killed run already synthesized and linked.
+        for sentence in ("明日です。", "今日です。", "昨日です。", "毎日です。"):
+            self.collection.add_note(DECK, _fields(sentence))
+        self.collection.add_note(DECK, _fields("明日です。", regenerate=True))
+        first = CountingGenerator(limit=2)
+        with self.assertRaises(KeyboardInterrupt):
+            self.quietly(self.processor(first, batch_size=2, use_cache=False).run, DECK)
+
+        second = CountingGenerator()
+        self.quietly(self.processor(second, batch_size=2, use_cache=False).resume)
+        self.assertFalse(first.texts & second.texts)
+        self.assertEqual(sum(first.texts.values()) + sum(second.texts.values()), 4)
+        self.assert_all_linked()
+
+    def test_nothing_to_resume_after_a_clean_run(self):
+        self.collection.add_note(DECK, _fields("明日です。"))
+        self.quietly(self.processor(CountingGenerator()).run, DECK)
+        generator = CountingGenerator()
+        self.quietly(self.processor(generator).resume)
+        self.assertFalse(generator.texts)
+
+
+class DeletingAnkiConnect(fake_anki.FakeAnkiConnect):
+    """Deletes one card (and its note) right after answering findCards."""
+
+    def __init__(self, collection: fake_anki.Collection, card_id: int):
+        super().__init__(collection)
+        self.card_id = card_id
+
+    def _dispatch(self, action: str, params: dict):
+        result = super()._dispatch(action, params)
+        if action == "findCards" and self.card_id in self.collection.cards:
+            card = self.collection.cards.pop(self.card_id)
+            del self.collection.notes[card.note_id]
+        return result
+
+
+class CardIndexSkipTest(PipelineTestCase):
+    """Notes the card index proves unchanged are skipped without being built."""
+
+    def setUp(self):
+        super().setUp()
+        self.notes = [
+            self.collection.add_note(DECK, _fields(sentence))
+            for sentence in ("明日です。", "今日です。", "昨日です。")
+        ]
+        self.quietly(self.processor(CountingGenerator()).run, DECK)
+        self.assert_all_linked()
+
+    def rerun(self) -> tuple[int, int]:
+        """(notes built, TTS calls) for another full run."""
+        generator = CountingGenerator()
+        with mock.patch.object(processor, "_build", wraps=processor._build) as build:
+            self.quietly(self.processor(generator, use_cache=False).run, DECK)
+        self.assert_all_linked()
+        return build.call_count, sum(generator.texts.values())
+
+    def test_second_run_skips_everything(self):
+        self.assertEqual(self.rerun(), (0, 0))
+
+    def test_edited_field_forces_a_rebuild(self):
+        self.notes[1].fields[processor.SENTENCE_FIELD] = "今日だ。"
+        self.assertEqual(self.rerun(), (1, 1))
+
+    def test_edited_rules_field_forces_a_rebuild(self):
+        self.notes[1].fields[processor.CARD_HINTS_FIELD] = "今日:きょう"
+        self.assertEqual(self.rerun(), (1, 1))
+
+    def test_regenerate_audio_forces_a_rebuild(self):
+        self.notes[2].fields[processor.REGENERATE_FIELD] = "1"
+        self.assertEqual(self.rerun(), (1, 1))
+
+    def test_hash_version_invalidates_every_row(self):
+        with mock.patch.object(hasher, "HASH_VERSION", hasher.HASH_VERSION + 1):
+            self.assertEqual(self.rerun(), (3, 3))
+
+    def test_voice_settings_invalidate_every_row(self):
+        with mock.patch.object(hasher, "SPEAKER", "Puck"):
+            self.assertEqual(self.rerun(), (3, 3))
+
+    def test_audio_field_pointing_elsewhere_forces_a_rebuild(self):
+        self.notes[0].fields[processor.AUDIO_FIELD] = ""
+        self.assertEqual(self.rerun(), (1, 0))  # rebuilt, then linked from Anki's media
+
+
+class DeletedMidFetchTest(PipelineTestCase):
+    def test_deleted_card_is_dropped(self):
+        kept = self.collection.add_note(DECK, _fields("明日です。"))
+        deleted = self.collection.add_note(DECK, _fields("今日です。"))
+        self.serve(DeletingAnkiConnect(self.collection, deleted.cards[0]))
+
+        generator = CountingGenerator()
+        proc = self.processor(generator)
+        self.quietly(proc.run, DECK)
+        self.assertEqual(sum(generator.texts.values()), 1)
+        self.assert_all_linked()
+        states = proc.index.states(DECK, [kept.note_id, deleted.note_id])
+        self.assertEqual(set(states), {kept.note_id})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import random
+import unittest
+
+import replacements as rpl
+
+# A small alphabet so random originals overlap, nest and share prefixes often.
+_KANJI = "明日小路曲目"
+_KANA = "あしたこみち"
+
+
+def _pairs(rng: random.Random, alphabet_for_readings: str) -> list[tuple[str, str]]:
+    originals = {
+        "".join(rng.choices(_KANJI, k=rng.randint(1, 3))) for _ in range(rng.randint(1, 6))
+    }
+    return [
+        (original, "".join(rng.choices(alphabet_for_readings, k=rng.randint(0, 3))))
+        for original in originals
+    ]
+
+
+class ApplyReadingsTest(unittest.TestCase):
+    """apply_readings() must match the sequential longest-first str.replace loop."""
+
+    def check(self, seed: int, reading_alphabet: str) -> None:
+        rng = random.Random(seed)
+        for _ in range(2000):
+            pairs = _pairs(rng, reading_alphabet)
+            sentence = "".join(rng.choices(_KANJI + "のが", k=rng.randint(0, 12)))
+            with self.subTest(sentence=sentence, pairs=pairs):
+                self.assertEqual(
+                    rpl.apply_readings(sentence, pairs),
+                    rpl._apply_sequentially(sentence, pairs),
+                )
+
+    def test_kana_readings(self):
+        self.check(seed=1, reading_alphabet=_KANA)
+
+    def test_readings_sharing_characters_with_originals(self):
+        # Falls back to the sequential version; still has to agree with it.
+        self.check(seed=2, reading_alphabet=_KANA + _KANJI)
+
+    def test_overlapping_and_equal_length_originals(self):
+        pairs = [("明日", "あした"), ("日小", "ひこ"), ("小路", "こみち"), ("明日小路", "あすこうじ")]
+        for sentence in ("明日小路", "明日小", "日小路明日", "明日明日小路小路"):
+            with self.subTest(sentence=sentence):
+                self.assertEqual(
+                    rpl.apply_readings(sentence, pairs),
+                    rpl._apply_sequentially(sentence, pairs),
+                )
+
+
+class MatcherTest(unittest.TestCase):
+    """_Matcher.find() must agree with `pattern in text` for every pattern."""
+
+    def check(self, patterns: list[str], text: str) -> None:
+        with self.subTest(patterns=patterns, text=text):
+            self.assertEqual(
+                rpl._Matcher(patterns).find(text), {p for p in patterns if p in text}
+            )
+
+    def test_random_patterns(self):
+        rng = random.Random(4)
+        for _ in range(2000):
+            # Short patterns over a small alphabet: prefixes, suffixes, nesting and
+            # repeats all come up, as do empty and duplicate patterns.
+            patterns = [
+                "".join(rng.choices(_KANJI[:3], k=rng.randint(0, 4)))
+                for _ in range(rng.randint(0, 12))
+            ]
+            text = "".join(rng.choices(_KANJI[:4], k=rng.randint(0, 15)))
+            self.check(patterns, text)
+
+    def test_overlapping_patterns(self):
+        patterns = ["", "明", "明日", "日小", "明日小路", "路", "小路小", "日日"]
+        for text in ("", "明日小路", "日小路小路", "明明日日", "小", "路明"):
+            self.check(patterns, text)
+
+
+class CompiledRulesTest(unittest.TestCase):
+    """CompiledRules.applicable() must match get_applicable() for the same data."""
+
+    def test_matches_get_applicable(self):
+        rng = random.Random(3)
+        words = ["".join(rng.choices(_KANJI, k=rng.randint(1, 3))) for _ in range(200)]
+
+        def scope(size: int) -> dict:
+            return {word: f"{size}{rng.random():.3f}" for word in rng.sample(words, size)}
+
+        data = {
+            "*": scope(60),
+            "INS": {"*": scope(40), "V1": {"*": scope(5), "P1": scope(3), "P2": scope(35)}},
+            "ASU": {"V2": {"P3": scope(2)}},
+        }
+        rules = rpl.CompiledRules(data)
+        sources = ["", "INS", "INS V1", "INS V1 P1", "INS V1 P1,2", "ASU V2 P3", "NG V1 P1"]
+        for _ in range(500):
+            sentence = "".join(rng.choices(_KANJI, k=rng.randint(0, 10)))
+            source = rng.choice(sources)
+            with self.subTest(sentence=sentence, source=source):
+                self.assertEqual(
+                    rules.applicable(sentence, source),
+                    rpl.get_applicable(data, sentence, source),
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()